@@ -1,11 +1,11 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 import logging
-import uvicorn
 from typing import List
 
 from schema import HealthResponse, RecommendationRequest, RecommendationResponse, Assessment
-from recommender import AssessmentRecommender
+from recommender import AssessmentRecommender, get_shared_recommender, shared_catalog_version
+from resilience import AdmissionController, Overloaded, get_admission_controller
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -25,9 +25,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Dependency injection for the recommender
+CATALOG_VERSION_HEADER = "X-Catalog-Version"
+RECOMMENDATION_MODE_HEADER = "X-Recommendation-Mode"
+
+@app.middleware("http")
+async def catalog_version_header(request: Request, call_next):
+    response = await call_next(request)
+    # /recommend sets the version it actually scored against; report the active one otherwise,
+    # without loading the catalog for requests (/, /health, /docs) that do not need it
+    if CATALOG_VERSION_HEADER not in response.headers:
+        version = shared_catalog_version()
+        if version:
+            response.headers[CATALOG_VERSION_HEADER] = version
+    return response
+
+# Dependency injection for the recommender (shared across requests)
 def get_recommender():
-    return AssessmentRecommender()
+    return get_shared_recommender()
+
+# Per-worker concurrency limit (shared across requests)
+def get_admission():
+    return get_admission_controller()
 
 @app.get("/", tags=["Root"])
 async def root():
@@ -37,28 +55,50 @@ async def root():
 async def health_check():
     return {"status": "ok"}
 
+# A plain def runs in the threadpool, so a slow embedding call does not block the event loop
 @app.post("/recommend", response_model=RecommendationResponse, tags=["Recommendations"])
-async def get_recommendations(
+def get_recommendations(
     request: RecommendationRequest,
-    recommender: AssessmentRecommender = Depends(get_recommender)
+    response: Response,
+    recommender: AssessmentRecommender = Depends(get_recommender),
+    admission: AdmissionController = Depends(get_admission)
 ):
     if not request.text or len(request.text.strip()) < 10:
         raise HTTPException(status_code=400, detail="Text input must be at least 10 characters long")
     
-    recommendations = recommender.recommend(request.text, request.top_n)
+    try:
+        with admission.admit():
+            recommendations, version, mode = recommender.recommend_with_mode(
+                request.text, request.top_n, request.diversity_lambda, request.pooling
+            )
+    except Overloaded as e:
+        # Shed load quickly instead of queueing without bound
+        raise HTTPException(status_code=503, detail=f"Server busy: {e}",
+                            headers={"Retry-After": str(e.retry_after)})
+    if version:
+        response.headers[CATALOG_VERSION_HEADER] = version
+    if mode:
+        response.headers[RECOMMENDATION_MODE_HEADER] = mode
     
     return RecommendationResponse(
         query=request.text,
         recommendations=[Assessment(**rec) for rec in recommendations],
-        count=len(recommendations)
+        count=len(recommendations),
+        mode=mode
     )
 
-@app.post("/refresh", tags=["Administration"])
+@app.post("/refresh", status_code=202, tags=["Administration"])
 async def refresh_data(recommender: AssessmentRecommender = Depends(get_recommender)):
-    recommender.refresh_data()
-    return {"status": "success", "message": "Assessment data refreshed"}
+    # Load and validate the new version in the background; requests keep using the active one
+    recommender.refresh_data_async()
+    return {
+        "status": "accepted",
+        "message": "Assessment data refresh started",
+        "catalog_version": recommender.catalog_version,
+    }
 
 def start():
+    import uvicorn
     uvicorn.run("api:app", host="0.0.0.0", port=8000, reload=True)
 
 if __name__ == "__main__":
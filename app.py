@@ -1,34 +1,31 @@
 from flask import Flask, render_template, jsonify, redirect, url_for, request
 import os
 import logging
-import json
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
-import requests
-from embeddings import EmbeddingGenerator
-from recommender import AssessmentRecommender
+from recommender import get_shared_recommender, shared_catalog_version
+from resilience import Overloaded, get_admission_controller
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-class Base(DeclarativeBase):
-    pass
-
-db = SQLAlchemy(model_class=Base)
 # create the app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "default-dev-key")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)  # needed for url_for to generate with https
 
-# Configure the database
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///assessments.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-# initialize the app with the extension
-db.init_app(app)
+CATALOG_VERSION_HEADER = "X-Catalog-Version"
+RECOMMENDATION_MODE_HEADER = "X-Recommendation-Mode"
+# Same limit as the FastAPI request schema (and the depth of the precomputed role template results)
+MAX_TOP_N = 50
+
+@app.after_request
+def catalog_version_header(response):
+    """Report the active catalog version unless the endpoint already set the one it used (never loads the catalog)"""
+    if CATALOG_VERSION_HEADER not in response.headers:
+        version = shared_catalog_version()
+        if version:
+            response.headers[CATALOG_VERSION_HEADER] = version
+    return response
 
 @app.route('/')
 def index():
@@ -51,20 +48,48 @@ def recommend():
             
         text = data['text']
         top_n = data.get('top_n', 10)
+        diversity_lambda = data.get('diversity_lambda')
+        pooling = data.get('pooling')
         
         if len(text.strip()) < 10:
             return jsonify({"error": "Text input must be at least 10 characters long"}), 400
+        if isinstance(top_n, bool) or not isinstance(top_n, int) or not 1 <= top_n <= MAX_TOP_N:
+            return jsonify({"error": f"top_n must be an integer between 1 and {MAX_TOP_N}"}), 400
+        if diversity_lambda is not None:
+            try:
+                diversity_lambda = float(diversity_lambda)
+            except (TypeError, ValueError):
+                diversity_lambda = float('nan')
+            # NaN fails the range check too
+            if not 0.0 <= diversity_lambda <= 1.0:
+                return jsonify({"error": "diversity_lambda must be a number between 0 and 1"}), 400
+        if pooling not in (None, 'max', 'mean'):
+            return jsonify({"error": "pooling must be 'max' or 'mean'"}), 400
             
-        # Get recommendations using the recommender
-        recommender = AssessmentRecommender()
-        recommendations = recommender.recommend(text, top_n)
+        # Get recommendations using the shared recommender
+        recommender = get_shared_recommender()
+        with get_admission_controller().admit():
+            recommendations, version, mode = recommender.recommend_with_mode(
+                text, top_n, diversity_lambda, pooling
+            )
         
         # Return recommendations
-        return jsonify({
+        response = jsonify({
             "query": text,
             "recommendations": recommendations,
-            "count": len(recommendations)
+            "count": len(recommendations),
+            "mode": mode
         })
+        if version:
+            response.headers[CATALOG_VERSION_HEADER] = version
+        if mode:
+            response.headers[RECOMMENDATION_MODE_HEADER] = mode
+        return response
+    except Overloaded as e:
+        # Shed load quickly instead of queueing without bound
+        response = jsonify({"error": f"Server busy: {e}"})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 503
     except Exception as e:
         logging.error(f"Error getting recommendations: {e}")
         return jsonify({"error": "Failed to get recommendations"}), 500
@@ -0,0 +1,305 @@
+import os
+import time
+import logging
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+from database import AssessmentDatabase
+from reduction import normalize_rows
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def _timed(fn, repeat: int = 3):
+    """Run fn `repeat` times and return (best seconds, last result)."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def synthetic_catalog(n_items: int, dim: int, seed: int = 0) -> pd.DataFrame:
+    """Build a catalog DataFrame with random embeddings."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n_items, dim)).astype(np.float32)
+    return pd.DataFrame({
+        'name': [f"Assessment {i}" for i in range(n_items)],
+        'url': [f"https://www.shl.com/products/{i}" for i in range(n_items)],
+        'description': [f"Synthetic assessment number {i} used for benchmarking." for i in range(n_items)],
+        'remote_testing': 'Yes',
+        'irt_support': 'No',
+        'duration': '30 minutes',
+        'test_type': 'Cognitive Assessment',
+        'embedding': [v.tolist() for v in vectors],
+    })
+
+
+def bench_snapshot(n_items: int, dim: int, repeat: int):
+    """Compare cold-start loaders: SQLite + pickle, CSV + json, and the columnar snapshot."""
+    df = synthetic_catalog(n_items, dim)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = AssessmentDatabase(db_path=os.path.join(tmp, 'bench.db'), csv_path=os.path.join(tmp, 'bench.csv'))
+        db.save_assessments(df)
+        db._save_to_csv(df)
+        snapshot_path = os.path.join(tmp, 'snapshot')
+        db.export_snapshot(snapshot_path)
+
+        def from_sqlite():
+            loaded = db._load_from_database()
+            return np.vstack(loaded['embedding'].to_numpy()).astype(np.float32)
+
+        def from_csv():
+            loaded = db._load_from_csv()
+            return np.vstack(loaded['embedding'].to_numpy()).astype(np.float32)
+
+        def from_snapshot():
+            snapshot = db.load_snapshot(snapshot_path)
+            # Touch every page so the comparison includes reading the vectors
+            float(snapshot['index'].sum())
+            return snapshot['index']
+
+        print(f"Cold-start load of {n_items} assessments x {dim} dims (best of {repeat}):")
+        for label, fn in (('sqlite+pickle', from_sqlite), ('csv+json', from_csv), ('snapshot', from_snapshot)):
+            seconds, matrix = _timed(fn, repeat)
+            print(f"  {label:<14} {seconds * 1000:10.1f} ms  matrix {matrix.shape}")
+        db.close()
+
+
+def bench_bulk_write(n_rows: int, dim: int):
+    """
+    Bulk-load n_rows small assessments through save_assessments (staging table, chunked
+    executemany, swap) while a reader thread keeps querying the live table.
+    """
+    import threading
+
+    df = synthetic_catalog(n_rows, dim)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = AssessmentDatabase(db_path=os.path.join(tmp, 'bench.db'), csv_path=os.path.join(tmp, 'bench.csv'))
+        db.save_assessments(df.head(1000))
+
+        stop = threading.Event()
+        reads = []
+
+        def reader():
+            while not stop.is_set():
+                start = time.perf_counter()
+                db.backend.query("SELECT COUNT(*) FROM assessments")
+                reads.append(time.perf_counter() - start)
+                # Paced like API traffic rather than a tight loop competing for the GIL
+                stop.wait(0.01)
+            db.close()
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        seconds, saved = _timed(lambda: db.save_assessments(df), 1)
+        stop.set()
+        thread.join()
+
+        count = db.backend.query("SELECT COUNT(*) FROM assessments")[0][0]
+        print(f"Bulk load of {n_rows} assessments x {dim} dims: {seconds:.2f}s "
+              f"({n_rows / seconds:,.0f} rows/s, saved={saved}, {count} rows live)")
+        if reads:
+            print(f"  concurrent reader: {len(reads)} queries, max {max(reads) * 1000:.1f} ms")
+        db.close()
+
+
+def bench_mmr(n_items: int, dim: int, queries: int, diversity_lambda: float):
+    """Per-query cost of plain top-k versus top-k followed by MMR re-ranking."""
+    from recommender import rank_catalog
+
+    rng = np.random.default_rng(0)
+    index = normalize_rows(rng.standard_normal((n_items, dim)).astype(np.float32))
+    query_vectors = normalize_rows(rng.standard_normal((queries, dim)).astype(np.float32))
+
+    def run(k, lam):
+        for q in query_vectors:
+            rank_catalog(index, q, k, lam)
+
+    print(f"Ranking {n_items} assessments x {dim} dims, mean of {queries} queries (lambda={diversity_lambda}):")
+    for k in (10, 50):
+        plain, _ = _timed(lambda: run(k, None))
+        mmr, _ = _timed(lambda: run(k, diversity_lambda))
+        print(f"  k={k:<3} top-k {plain / queries * 1e6:9.1f} us   top-k+mmr {mmr / queries * 1e6:9.1f} us   "
+              f"overhead {(mmr - plain) / queries * 1e6:9.1f} us")
+
+
+def synthetic_job_description(n_chars: int, seed: int = 0) -> str:
+    """A job description of roughly n_chars made of bulleted requirement lines."""
+    rng = np.random.default_rng(seed)
+    skills = ['Java', 'Python', 'SQL', 'stakeholder management', 'numerical reasoning', 'customer service',
+              'team leadership', 'data analysis', 'verbal reasoning', 'sales negotiation', 'cloud infrastructure']
+    lines = []
+    total = 0
+    while total < n_chars:
+        line = f"- Experience with {rng.choice(skills)} and {rng.choice(skills)} in a fast-paced environment."
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines)
+
+
+def bench_query_chunks(n_items: int, dim: int, repeat: int):
+    """Chunking and pooled scoring cost as the job description grows (embedding calls excluded)."""
+    from chunking import chunk_query
+    from recommender import rank_catalog
+
+    rng = np.random.default_rng(0)
+    index = normalize_rows(rng.standard_normal((n_items, dim)).astype(np.float32))
+
+    print(f"Chunked query scoring against {n_items} assessments x {dim} dims (best of {repeat}):")
+    for n_chars in (500, 5000, 20000, 100000, 500000):
+        text = synthetic_job_description(n_chars)
+        chunk_seconds, chunks = _timed(lambda: chunk_query(text), repeat)
+        query_vectors = normalize_rows(rng.standard_normal((len(chunks), dim)).astype(np.float32))
+        if len(chunks) == 1:
+            query_vectors = query_vectors[0]
+        score_seconds, _ = _timed(lambda: rank_catalog(index, query_vectors, 10), repeat)
+        print(f"  {n_chars:>7} chars  {len(chunks):>3} chunks  chunking {chunk_seconds * 1000:7.2f} ms  "
+              f"scoring {score_seconds * 1000:7.2f} ms")
+
+
+def bench_multivector(n_items: int, dim: int, repeat: int):
+    """Single-vector scoring versus segment-max scoring as the vectors per assessment grow."""
+    from recommender import rank_catalog
+
+    rng = np.random.default_rng(0)
+    index = normalize_rows(rng.standard_normal((n_items, dim)).astype(np.float32))
+    query = normalize_rows(rng.standard_normal(dim).astype(np.float32))
+
+    single, _ = _timed(lambda: rank_catalog(index, query, 10), repeat)
+    print(f"Scoring {n_items} assessments x {dim} dims (best of {repeat}):")
+    print(f"  1 vector/item     {n_items:>9} vectors  {single * 1000:8.2f} ms")
+    for per_item in (2, 4, 8):
+        # Uneven segment counts averaging per_item vectors per assessment
+        counts = rng.integers(1, 2 * per_item, n_items)
+        offsets = np.zeros(n_items, dtype=np.int64)
+        np.cumsum(counts[:-1], out=offsets[1:])
+        segments = normalize_rows(rng.standard_normal((int(counts.sum()), dim)).astype(np.float32))
+        seconds, _ = _timed(lambda: rank_catalog(index, query, 10, segments=segments, offsets=offsets), repeat)
+        print(f"  ~{per_item} vectors/item  {len(segments):>9} vectors  {seconds * 1000:8.2f} ms")
+
+
+def bench_faults(n_items: int, requests_per_phase: int, concurrency: int):
+    """
+    Serve concurrent requests through admission control while a fault-injecting stub degrades
+    the embedding API, and report latency percentiles, ranking modes and shed requests per phase.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from evaluation import StubEmbeddingGenerator
+    from recommender import AssessmentRecommender
+    from resilience import AdmissionController, CircuitBreaker, FaultInjectingEmbeddingGenerator, Overloaded
+
+    skills = ['Java', 'Python', 'SQL', 'stakeholder management', 'numerical reasoning', 'customer service',
+              'team leadership', 'data analysis', 'verbal reasoning', 'sales negotiation', 'cloud infrastructure']
+    rng = np.random.default_rng(0)
+    catalog = synthetic_catalog(n_items, 8).drop(columns=['embedding'])
+    catalog['description'] = [f"Measures {rng.choice(skills)} and {rng.choice(skills)} for {rng.choice(skills)} roles."
+                              for _ in range(n_items)]
+    stub = StubEmbeddingGenerator(256)
+    records = catalog.to_dict('records')
+    stub.generate_record_embeddings(records)
+    faults = FaultInjectingEmbeddingGenerator(stub, seed=0)
+
+    # Short timeouts so the run takes seconds: a 0.5s call budget, calls over 0.25s count as slow
+    phases = (
+        ('healthy', {'latency': 0.02, 'error_rate': 0.0}),
+        ('slow', {'latency': 1.0, 'error_rate': 0.0}),
+        ('failing', {'latency': 0.02, 'error_rate': 1.0}),
+        ('recovered', {'latency': 0.02, 'error_rate': 0.0}),
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        db = AssessmentDatabase(db_path=os.path.join(tmp, 'bench.db'), csv_path=os.path.join(tmp, 'bench.csv'))
+        db.save_assessments(pd.DataFrame(records))
+        snapshot_path = os.path.join(tmp, 'snapshot')
+        db.export_snapshot(snapshot_path)
+        recommender = AssessmentRecommender(database=db, embedding_generator=faults, snapshot_path=snapshot_path,
+                                            watch=False, embed_timeout=0.5,
+                                            breaker=CircuitBreaker("embeddings", slow_call_seconds=0.25, open_seconds=2.0))
+        # Room for every client, so requests are only shed when they wait too long for a slot
+        # (closed-loop clients would otherwise spin through the phase on instant 503s)
+        admission = AdmissionController(max_concurrent=max(concurrency // 2, 1), max_queue=concurrency,
+                                        queue_timeout=0.5)
+
+        def serve(i):
+            start = time.perf_counter()
+            try:
+                with admission.admit():
+                    _, _, mode = recommender.recommend_with_mode(synthetic_job_description(200, seed=i), 10)
+            except Overloaded:
+                mode = '503'
+            return time.perf_counter() - start, mode
+
+        print(f"{requests_per_phase} requests per phase, {concurrency} concurrent clients, "
+              f"admission {admission.max_concurrent} + queue {admission.max_queue}:")
+        print(f"  {'phase':<10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  outcomes")
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for p, (phase, settings) in enumerate(phases):
+                if phase == 'recovered':
+                    # Let the open circuit reach its half-open trial
+                    time.sleep(recommender.breaker.open_seconds)
+                faults.latency = settings['latency']
+                faults.error_rate = settings['error_rate']
+                seeds = range(p * requests_per_phase, (p + 1) * requests_per_phase)
+                results = list(pool.map(serve, seeds))
+                latencies = np.array([seconds for seconds, _ in results]) * 1000
+                outcomes = pd.Series([mode for _, mode in results]).value_counts().to_dict()
+                p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+                print(f"  {phase:<10}{p50:9.1f}{p95:9.1f}{p99:9.1f}  {outcomes}  (circuit {recommender.breaker.state})")
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Performance benchmarks for the recommender')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    snapshot_parser = subparsers.add_parser('snapshot', help='Catalog cold-start loaders')
+    snapshot_parser.add_argument('--items', type=int, default=20000)
+    snapshot_parser.add_argument('--dim', type=int, default=768)
+    snapshot_parser.add_argument('--repeat', type=int, default=3)
+
+    write_parser = subparsers.add_parser('bulkwrite', help='Bulk catalog load with a concurrent reader')
+    write_parser.add_argument('--rows', type=int, default=1000000)
+    write_parser.add_argument('--dim', type=int, default=8)
+
+    mmr_parser = subparsers.add_parser('mmr', help='Diversity re-ranking overhead')
+    mmr_parser.add_argument('--items', type=int, default=20000)
+    mmr_parser.add_argument('--dim', type=int, default=768)
+    mmr_parser.add_argument('--queries', type=int, default=200)
+    mmr_parser.add_argument('--diversity-lambda', type=float, default=0.7)
+
+    chunks_parser = subparsers.add_parser('chunks', help='Long job description chunking and pooled scoring')
+    chunks_parser.add_argument('--items', type=int, default=20000)
+    chunks_parser.add_argument('--dim', type=int, default=768)
+    chunks_parser.add_argument('--repeat', type=int, default=3)
+
+    multivector_parser = subparsers.add_parser('multivector', help='Multi-vector segment-max scoring')
+    multivector_parser.add_argument('--items', type=int, default=20000)
+    multivector_parser.add_argument('--dim', type=int, default=768)
+    multivector_parser.add_argument('--repeat', type=int, default=3)
+
+    faults_parser = subparsers.add_parser('faults', help='Tail latency and fallback under embedding API faults')
+    faults_parser.add_argument('--items', type=int, default=500)
+    faults_parser.add_argument('--requests', type=int, default=200, help='Requests per phase')
+    faults_parser.add_argument('--concurrency', type=int, default=16)
+
+    args = parser.parse_args()
+    # Keep the timing output readable
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.benchmark == 'snapshot':
+        bench_snapshot(args.items, args.dim, args.repeat)
+    elif args.benchmark == 'bulkwrite':
+        bench_bulk_write(args.rows, args.dim)
+    elif args.benchmark == 'mmr':
+        bench_mmr(args.items, args.dim, args.queries, args.diversity_lambda)
+    elif args.benchmark == 'chunks':
+        bench_query_chunks(args.items, args.dim, args.repeat)
+    elif args.benchmark == 'multivector':
+        bench_multivector(args.items, args.dim, args.repeat)
+    elif args.benchmark == 'faults':
+        bench_faults(args.items, args.requests, args.concurrency)
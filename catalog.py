@@ -0,0 +1,194 @@
+import os
+import time
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from embeddings import assessment_text
+from lexical import LexicalIndex
+from reduction import EmbeddingReducer
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Seconds between checks for a newly published catalog version (0 disables watching)
+CATALOG_WATCH_INTERVAL = float(os.getenv("CATALOG_WATCH_INTERVAL", 5))
+
+
+class CatalogVersion:
+    """
+    An immutable, validated catalog generation: metadata, scoring index, optional per-field
+    (multi-vector) index and reducer.
+    Requests hold a reference for their whole duration, so a version is only freed
+    once every in-flight request that started on it has finished.
+    """
+    def __init__(self, version: str, metadata: pd.DataFrame, index: np.ndarray,
+                 reducer: Optional[EmbeddingReducer] = None, source: str = "database",
+                 segments: Optional[np.ndarray] = None, offsets: Optional[np.ndarray] = None):
+        self.version = version
+        self.metadata = metadata
+        self.index = index
+        self.reducer = reducer
+        # Flattened per-field vectors; assessment i owns rows offsets[i]:offsets[i + 1]
+        self.segments = segments
+        self.offsets = offsets
+        self.source = source
+        self.loaded_at = time.time()
+        self.in_flight = 0
+        self._lexical = None
+        self._lexical_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.metadata)
+
+    @property
+    def lexical(self) -> LexicalIndex:
+        """BM25 index over the catalog text, for ranking while query embeddings are unavailable."""
+        if self._lexical is None:
+            with self._lexical_lock:
+                if self._lexical is None:
+                    self._lexical = LexicalIndex([assessment_text(row) for row in self.metadata.to_dict('records')])
+        return self._lexical
+
+    def validate(self):
+        """Raise ValueError if the version is not safe to serve."""
+        if len(self.metadata) == 0:
+            raise ValueError("catalog is empty")
+        if self.index.ndim != 2 or self.index.shape[0] != len(self.metadata):
+            raise ValueError(f"index shape {self.index.shape} does not match {len(self.metadata)} assessments")
+        if self.reducer is not None and self.reducer.n_components != self.index.shape[1]:
+            raise ValueError("reducer output dimension does not match the index")
+        # Reading every row also warms the page cache before the version takes traffic
+        norms = np.linalg.norm(self.index, axis=1)
+        if not np.all(np.isfinite(norms)):
+            raise ValueError("index contains non-finite values")
+        if not np.allclose(norms, 1.0, atol=1e-3):
+            raise ValueError("index rows are not L2-normalized")
+
+        if self.segments is None:
+            return
+        offsets = self.offsets
+        if offsets is None or len(offsets) != len(self.metadata) or offsets[0] != 0:
+            raise ValueError("segment offsets do not match the assessments")
+        if np.any(np.diff(offsets) <= 0) or offsets[-1] >= len(self.segments):
+            raise ValueError("every assessment needs at least one segment vector")
+        if self.segments.ndim != 2 or self.segments.shape[1] != self.index.shape[1]:
+            raise ValueError("segment vectors do not match the index dimension")
+        segment_norms = np.linalg.norm(self.segments, axis=1)
+        if not np.all(np.isfinite(segment_norms)) or not np.allclose(segment_norms, 1.0, atol=1e-3):
+            raise ValueError("segment vectors are not finite and L2-normalized")
+
+
+class CatalogManager:
+    """
+    Holds the active CatalogVersion and swaps in new versions without blocking requests.
+    New versions are built and validated off the request path, then published with a
+    single reference assignment; the previous version is released when its requests drain.
+    """
+    def __init__(self, loader: Callable[[], Optional[CatalogVersion]],
+                 version_probe: Optional[Callable[[], Optional[str]]] = None,
+                 watch_interval: float = CATALOG_WATCH_INTERVAL):
+        """
+        Args:
+            loader: Builds a new CatalogVersion from the current snapshot or database
+            version_probe: Cheaply returns the version id that `loader` would load, for the watcher
+            watch_interval (float): Seconds between probes (0 disables the watcher)
+        """
+        self.loader = loader
+        self.version_probe = version_probe
+        self.watch_interval = watch_interval
+        self.active: Optional[CatalogVersion] = None
+        self._retired = []
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._watcher_pid = None
+
+    @property
+    def version(self) -> Optional[str]:
+        active = self.active
+        return active.version if active is not None else None
+
+    @contextmanager
+    def acquire(self):
+        """Pin the active version for the duration of a request."""
+        self._ensure_watcher()
+        with self._lock:
+            version = self.active
+            if version is not None:
+                version.in_flight += 1
+        try:
+            yield version
+        finally:
+            if version is not None:
+                with self._lock:
+                    version.in_flight -= 1
+                    self._release_drained()
+
+    def reload(self) -> bool:
+        """Build, validate and publish a new version. Returns False if the current one was kept."""
+        with self._reload_lock:
+            start = time.perf_counter()
+            try:
+                candidate = self.loader()
+                if candidate is None:
+                    raise ValueError("no catalog data available")
+                candidate.validate()
+                # Build the fallback index off the request path, so it is ready if the embedding API fails
+                candidate.lexical
+            except Exception as e:
+                logging.error(f"Catalog reload rejected; keeping version {self.version}: {e}")
+                return False
+
+            if self.active is not None and candidate.version == self.active.version:
+                logging.info(f"Catalog version {candidate.version} is already active")
+                return True
+            self._publish(candidate)
+            logging.info(f"Activated catalog version {candidate.version} ({len(candidate)} assessments "
+                         f"from {candidate.source}) in {time.perf_counter() - start:.2f}s")
+            return True
+
+    def reload_async(self) -> threading.Thread:
+        """Run reload() on a background thread."""
+        thread = threading.Thread(target=self.reload, name="catalog-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def _publish(self, candidate: CatalogVersion):
+        with self._lock:
+            previous = self.active
+            # Requests that already pinned `previous` keep using it
+            self.active = candidate
+            if previous is not None:
+                self._retired.append(previous)
+            self._release_drained()
+
+    def _release_drained(self):
+        """Drop references to retired versions with no requests left (caller holds _lock)."""
+        for version in [v for v in self._retired if v.in_flight == 0]:
+            self._retired.remove(version)
+            logging.info(f"Released catalog version {version.version}")
+
+    def _ensure_watcher(self):
+        # Threads do not survive fork, so each worker process starts its own watcher on first use
+        if not self.watch_interval or self.version_probe is None or self._watcher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+            self._watcher = threading.Thread(target=self._watch, name="catalog-watcher", daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.watch_interval)
+            try:
+                published = self.version_probe()
+                if published is not None and published != self.version:
+                    logging.info(f"New catalog version {published} published; reloading")
+                    self.reload()
+            except Exception as e:
+                logging.error(f"Catalog watcher error: {e}")
@@ -0,0 +1,112 @@
+import os
+import re
+import logging
+import unicodedata
+from typing import List
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Target chunk size for long queries (~500 tokens); small enough that a requirement is not
+# diluted by the rest of the job description
+QUERY_CHUNK_CHARS = int(os.getenv("QUERY_CHUNK_CHARS", 2000))
+# Upper bound on chunks per query, so a query costs at most one bounded batch call
+QUERY_MAX_CHUNKS = int(os.getenv("QUERY_MAX_CHUNKS", 16))
+# text-embedding-004 accepts 2048 input tokens; stay safely below that in characters
+MODEL_MAX_CHARS = 7000
+
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?;:])\s+|\n+')
+_INLINE_SPACE = re.compile(r'[ \t\f\v]+')
+_BULLET = re.compile(r'^\s*(?:[-*•▪●‣⁃]|\d+[.)])\s+', re.MULTILINE)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize unicode, bullets and whitespace while keeping line structure."""
+    text = unicodedata.normalize('NFKC', text)
+    text = _BULLET.sub('', text)
+    text = _INLINE_SPACE.sub(' ', text)
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    """Split a sentence longer than max_chars on word boundaries."""
+    pieces = []
+    current = ''
+    for word in sentence.split(' '):
+        while len(word) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.append(word[:max_chars])
+            word = word[max_chars:]
+        if current and len(current) + 1 + len(word) > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_text(text: str, max_chars: int) -> List[str]:
+    """
+    Pack sentences and lines of an already normalized text into chunks of at most max_chars.
+    Chunks only break between sentences unless a single sentence is longer than max_chars.
+    """
+    chunks = []
+    current = ''
+    for sentence in _SENTENCE_BREAK.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        for piece in (_split_long(sentence, max_chars) if len(sentence) > max_chars else [sentence]):
+            if current and len(current) + 1 + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_query(text: str, chunk_chars: int = QUERY_CHUNK_CHARS, max_chunks: int = QUERY_MAX_CHUNKS) -> List[str]:
+    """
+    Normalize a query and split it into at most max_chunks chunks for embedding.
+    Short queries come back as a single chunk. Longer ones grow the chunk size (up to the
+    model's input limit) before anything is dropped, so the number of chunks stays bounded.
+
+    Args:
+        text (str): Job description or natural language query
+        chunk_chars (int): Preferred chunk size in characters
+        max_chunks (int): Maximum number of chunks
+
+    Returns:
+        List[str]: Query chunks in document order
+    """
+    limit = max_chunks * MODEL_MAX_CHARS
+    # Whitespace collapsing means the normalized text is no longer than this; bound its cost on huge inputs
+    text = normalize_text(text[:2 * limit])
+    if not text:
+        return []
+    if len(text) <= chunk_chars:
+        return [text]
+
+    # Text beyond what max_chunks full-size chunks can hold is never embedded; cut it before chunking
+    # so the cost of this step is bounded too
+    if len(text) > limit:
+        logging.warning(f"Query too long: ignoring everything after the first {limit} characters")
+        text = text[:limit]
+
+    size = min(max(chunk_chars, -(-len(text) // max_chunks)), MODEL_MAX_CHARS)
+    chunks = chunk_text(text, size)
+    if len(chunks) > max_chunks:
+        # Sentence packing leaves some slack; try once more with the largest chunks the model accepts
+        if size < MODEL_MAX_CHARS:
+            chunks = chunk_text(text, MODEL_MAX_CHARS)
+        if len(chunks) > max_chunks:
+            dropped = sum(len(chunk) for chunk in chunks[max_chunks:])
+            logging.warning(f"Query too long: ignoring the last {dropped} characters")
+            chunks = chunks[:max_chunks]
+    return chunks
@@ -1,53 +1,178 @@
 import os
 import json
-import sqlite3
+import time
+import uuid
+import shutil
+import hashlib
+import numpy as np
 import pandas as pd
 import pickle
 import logging
-from typing import List, Dict, Any, Optional
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+import storage
+from reduction import EmbeddingReducer, normalize_rows
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+ASSESSMENTS_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS {table} (
+    id {id_column},
+    name TEXT NOT NULL,
+    url TEXT,
+    description TEXT,
+    remote_testing TEXT,
+    irt_support TEXT,
+    duration TEXT,
+    test_type TEXT,
+    embedding {vector_type}
+)
+'''
+
+# Per-field vectors of each assessment (name, short description, detail chunks)
+SEGMENTS_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS {table} (
+    assessment_id INTEGER NOT NULL,
+    field TEXT NOT NULL,
+    ordinal INTEGER NOT NULL,
+    embedding {vector_type}
+)
+'''
+
+REDUCER_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS embedding_reducer (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    method TEXT NOT NULL,
+    n_components INTEGER NOT NULL,
+    state {blob_type} NOT NULL
+)
+'''
+
+# Changed on every write to the catalog or its reducer; snapshots record the revision they were
+# exported from, so a snapshot older than the database is never served in its place
+CATALOG_REVISION_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS catalog_revision (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    revision TEXT NOT NULL
+)
+'''
+
+# Columnar catalog snapshots used for fast cold starts and hot reloads
+DEFAULT_SNAPSHOT_PATH = os.getenv('CATALOG_SNAPSHOT', 'catalog_snapshot')
+SNAPSHOT_FORMAT_VERSION = 1
+# Older snapshot versions kept on disk for workers that are still draining them
+SNAPSHOT_KEEP_VERSIONS = int(os.getenv('CATALOG_SNAPSHOT_KEEP', 3))
+
+ASSESSMENT_COLUMNS = ('name', 'url', 'description', 'remote_testing', 'irt_support', 'duration', 'test_type', 'embedding')
+SEGMENT_COLUMNS = ('assessment_id', 'field', 'ordinal', 'embedding')
+
+# Rows per bulk insert call / transaction during bulk loads
+WRITE_CHUNK_SIZE = int(os.getenv('STORAGE_WRITE_CHUNK_SIZE', os.getenv('SQLITE_WRITE_CHUNK_SIZE', 10000)))
+
+def snapshot_version(path: str = DEFAULT_SNAPSHOT_PATH) -> Optional[str]:
+    """The active snapshot version under `path` (from its CURRENT pointer file), or None."""
+    try:
+        with open(os.path.join(path, 'CURRENT')) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def snapshot_exists(path: str = DEFAULT_SNAPSHOT_PATH) -> bool:
+    """Cheap check for a snapshot, without importing pyarrow or loading it."""
+    return snapshot_version(path) is not None
+
+def build_segment_matrix(ids: np.ndarray, vectors: np.ndarray,
+                         segments: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lay out every assessment's vectors contiguously in one flattened matrix.
+    Each assessment contributes its whole-item vector followed by its per-field vectors,
+    so every segment is non-empty and the item vector is always a candidate.
+    
+    Args:
+        ids (np.ndarray): Assessment ids, in catalog order
+        vectors (np.ndarray): Whole-item vectors (n, dim), in catalog order
+        segments (pd.DataFrame): 'assessment_id' and 'embedding' rows, ordered within each assessment
+        
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Flattened (total, dim) float32 matrix and the (n,) start offset of each assessment
+    """
+    position = pd.Series(np.arange(len(ids)), index=ids)
+    segments = segments[segments['assessment_id'].isin(position.index) & segments['embedding'].notna()]
+    segments = segments[segments['embedding'].map(len) == vectors.shape[1]]
+    
+    item = position.loc[segments['assessment_id']].to_numpy()
+    counts = np.bincount(item, minlength=len(ids)) + 1
+    offsets = np.zeros(len(ids), dtype=np.int64)
+    np.cumsum(counts[:-1], out=offsets[1:])
+    
+    flat = np.empty((int(counts.sum()), vectors.shape[1]), dtype=np.float32)
+    flat[offsets] = vectors
+    if len(segments):
+        # Rank of each segment within its assessment, keeping the stored order
+        order = np.argsort(item, kind='stable')
+        rank = np.empty(len(item), dtype=np.int64)
+        sorted_item = item[order]
+        starts = np.searchsorted(sorted_item, sorted_item, side='left')
+        rank[order] = np.arange(len(item)) - starts
+        flat[offsets[item] + 1 + rank] = np.vstack(segments['embedding'].to_numpy())
+    return flat, offsets
+
+def _chunked(rows: Iterable[Tuple], size: int) -> Iterator[List[Tuple]]:
+    """Split an iterable of rows into lists of at most `size` rows."""
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
 class AssessmentDatabase:
     """
     Handles storing and retrieving assessment data with embeddings.
-    Supports both CSV and SQLite storage methods.
+    Supports database (SQLite or PostgreSQL, see storage.py) and CSV storage methods.
     """
-    def __init__(self, db_path: str = 'assessments.db', csv_path: str = 'assessments_with_embeddings.csv'):
-        self.db_path = db_path
+    def __init__(self, db_path: Optional[str] = None, csv_path: str = 'assessments_with_embeddings.csv',
+                 database_url: Optional[str] = None):
+        if database_url is None:
+            database_url = f"sqlite:///{db_path}" if db_path else storage.database_url()
+        self.backend = storage.get_backend(database_url)
+        self.db_path = getattr(self.backend, 'path', None)
         self.csv_path = csv_path
-        self.use_sqlite = True  # Flag to control which storage method to use
-        
-        # Initialize database if using SQLite
-        if self.use_sqlite:
-            self._init_sqlite_db()
-    
-    def _init_sqlite_db(self):
-        """Initialize SQLite database with required schema."""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Create assessments table
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS assessments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                url TEXT,
-                description TEXT,
-                remote_testing TEXT,
-                irt_support TEXT,
-                duration TEXT,
-                test_type TEXT,
-                embedding BLOB
-            )
-            ''')
+        self.use_database = True  # Flag to control which storage method to use
+        self._next_id = 1
+        
+        # Initialize database schema
+        if self.use_database:
+            self._init_db()
+    
+    def close(self):
+        """Release this thread's database connection."""
+        self.backend.close()
+    
+    def _format_ddl(self, statement: str, **kwargs) -> str:
+        return statement.format(
+            id_column=self.backend.id_column,
+            vector_type=self.backend.vector_type,
+            blob_type=self.backend.blob_type,
+            **kwargs
+        )
+    
+    def _init_db(self):
+        """Initialize the database with required schema."""
+        try:
+            with self.backend.transaction() as cursor:
+                # Create assessments table
+                cursor.execute(self._format_ddl(ASSESSMENTS_TABLE_SQL, table='assessments'))
+                cursor.execute(self._format_ddl(SEGMENTS_TABLE_SQL, table='assessment_vectors'))
+                
+                # Fitted dimensionality reduction stage, stored alongside the vectors
+                cursor.execute(self._format_ddl(REDUCER_TABLE_SQL))
+                cursor.execute(CATALOG_REVISION_TABLE_SQL)
             
-            conn.commit()
-            conn.close()
-            logging.info(f"SQLite database initialized at {self.db_path}")
+            logging.info(f"Database initialized ({self.backend!r})")
         except Exception as e:
-            logging.error(f"Error initializing SQLite database: {e}")
+            logging.error(f"Error initializing database: {e}")
     
     def save_assessments(self, df: pd.DataFrame) -> bool:
         """
@@ -59,52 +184,169 @@ class AssessmentDatabase:
         Returns:
             bool: Success status
         """
-        if self.use_sqlite:
-            return self._save_to_sqlite(df)
+        if self.use_database:
+            return self._save_to_database(df)
         else:
             return self._save_to_csv(df)
     
-    def _save_to_sqlite(self, df: pd.DataFrame) -> bool:
-        """Save assessment data to SQLite database."""
+    def _save_to_database(self, df: pd.DataFrame) -> bool:
+        """
+        Save assessment data to the database.
+        Rows are bulk-loaded into a staging table in chunked transactions and swapped in at the end,
+        so readers see either the old or the new catalog, never a partial one.
+        """
+        if not self.begin_ingest():
+            return False
+        
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            # Column-wise lists are much cheaper to walk than iterrows()/itertuples()
+            ids = range(1, len(df) + 1)
+            columns = [df[c].tolist() if c in df.columns else [None] * len(df) for c in ASSESSMENT_COLUMNS]
+            rows = zip(ids, *columns)
+            for chunk in _chunked(rows, WRITE_CHUNK_SIZE):
+                self._insert_rows('assessments_staging', chunk)
             
-            # Clear existing data
-            cursor.execute("DELETE FROM assessments")
+            if 'segments' in df.columns:
+                segment_rows = (
+                    (assessment_id, field, ordinal, embedding)
+                    for assessment_id, segments in zip(ids, df['segments'].tolist())
+                    for ordinal, (field, embedding) in enumerate(segments if isinstance(segments, list) else [])
+                )
+                for chunk in _chunked(segment_rows, WRITE_CHUNK_SIZE):
+                    self._insert_segments('assessment_vectors_staging', chunk)
+        except Exception as e:
+            logging.error(f"Error saving to database: {e}")
+            return False
+        
+        if not self.commit_ingest():
+            return False
+        logging.info(f"Saved {len(df)} assessments to database")
+        return True
+    
+    def _insert_rows(self, table: str, rows: List[Tuple]):
+        """Insert one chunk of (id, name, ..., embedding) tuples in a single transaction."""
+        self.backend.bulk_insert(table, ('id',) + ASSESSMENT_COLUMNS, rows)
+    
+    def _insert_segments(self, table: str, rows: List[Tuple]):
+        """Insert one chunk of (assessment_id, field, ordinal, embedding) tuples in a single transaction."""
+        self.backend.bulk_insert(table, SEGMENT_COLUMNS, rows)
+    
+    def begin_ingest(self) -> bool:
+        """
+        Prepare an empty staging table for a streaming ingest.
+        Rows are appended in batches and only replace the live catalog on commit_ingest().
+        """
+        try:
+            with self.backend.transaction() as cursor:
+                cursor.execute("DROP TABLE IF EXISTS assessments_staging")
+                cursor.execute(self._format_ddl(ASSESSMENTS_TABLE_SQL, table='assessments_staging'))
+                cursor.execute("DROP TABLE IF EXISTS assessment_vectors_staging")
+                cursor.execute(self._format_ddl(SEGMENTS_TABLE_SQL, table='assessment_vectors_staging'))
+            # Ids are assigned here so per-field vectors can reference their assessment
+            self._next_id = 1
+            return True
+        except Exception as e:
+            logging.error(f"Error preparing staging table: {e}")
+            return False
+    
+    def append_assessments(self, records: List[Dict[str, Any]]) -> bool:
+        """
+        Append a batch of assessment records with embeddings to the staging table.
+        
+        Args:
+            records (List[Dict]): Assessment records with an 'embedding' key and optionally
+                'segments', a list of (field, embedding) pairs
             
-            # Insert data
-            for _, row in df.iterrows():
-                # Pickle the embedding to store as binary
-                embedding_pickle = pickle.dumps(row['embedding']) if row['embedding'] is not None else None
-                
-                cursor.execute('''
-                INSERT INTO assessments (name, url, description, remote_testing, irt_support, duration, test_type, embedding)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    row['name'],
-                    row['url'],
-                    row['description'],
-                    row['remote_testing'],
-                    row['irt_support'],
-                    row['duration'],
-                    row['test_type'],
-                    embedding_pickle
-                ))
-            
-            conn.commit()
-            conn.close()
-            logging.info(f"Saved {len(df)} assessments to SQLite database")
+        Returns:
+            bool: Success status
+        """
+        try:
+            ids = range(self._next_id, self._next_id + len(records))
+            rows = [(assessment_id,) + tuple(record.get(column) for column in ASSESSMENT_COLUMNS)
+                    for assessment_id, record in zip(ids, records)]
+            segment_rows = [
+                (assessment_id, field, ordinal, embedding)
+                for assessment_id, record in zip(ids, records)
+                for ordinal, (field, embedding) in enumerate(record.get('segments') or [])
+            ]
+            for chunk in _chunked(rows, WRITE_CHUNK_SIZE):
+                self._insert_rows('assessments_staging', chunk)
+            for chunk in _chunked(segment_rows, WRITE_CHUNK_SIZE):
+                self._insert_segments('assessment_vectors_staging', chunk)
+            self._next_id += len(records)
+            return True
+        except Exception as e:
+            logging.error(f"Error appending to staging table: {e}")
+            return False
+    
+    def commit_ingest(self) -> bool:
+        """Atomically replace the live catalog with the staged rows."""
+        try:
+            with self.backend.transaction() as cursor:
+                cursor.execute("DROP TABLE assessments")
+                cursor.execute("ALTER TABLE assessments_staging RENAME TO assessments")
+                cursor.execute("DROP TABLE IF EXISTS assessment_vectors")
+                cursor.execute("ALTER TABLE assessment_vectors_staging RENAME TO assessment_vectors")
+                self._bump_revision(cursor)
+            count = self.backend.query("SELECT COUNT(*) FROM assessments")[0][0]
+            logging.info(f"Committed {count} staged assessments to database")
+            # The ingest's writer threads have finished; drop their connections
+            self.backend.close_idle()
+            return True
+        except Exception as e:
+            logging.error(f"Error committing staged assessments: {e}")
+            return False
+    
+    def _bump_revision(self, cursor):
+        """Record a new catalog revision inside the caller's write transaction."""
+        cursor.execute("DELETE FROM catalog_revision")
+        cursor.execute(self.backend.sql("INSERT INTO catalog_revision (id, revision) VALUES (1, ?)"),
+                       (uuid.uuid4().hex[:12],))
+    
+    def catalog_revision(self) -> Optional[str]:
+        """
+        The revision of the stored catalog, changed by every catalog or reducer write.
+        
+        Returns:
+            Optional[str]: The revision, or None if the catalog has never been written (or is kept in CSV)
+        
+        Raises:
+            Exception: If the database cannot be read
+        """
+        if not self.use_database:
+            return None
+        rows = self.backend.query("SELECT revision FROM catalog_revision WHERE id = 1")
+        return rows[0][0] if rows else None
+    
+    def snapshot_is_current(self, snapshot: Dict[str, Any]) -> bool:
+        """
+        Check that a loaded snapshot was exported from the catalog now in the database, i.e. that
+        nothing (an ingest, save_assessments, a reducer change, another host sharing the database)
+        has written to it since. A snapshot is trusted if the database cannot be read.
+        """
+        try:
+            revision = self.catalog_revision()
+        except Exception as e:
+            logging.warning(f"Could not read the catalog revision ({e}); trusting snapshot {snapshot['version']}")
+            return True
+        return snapshot['manifest'].get('db_revision') == revision
+    
+    def abort_ingest(self) -> bool:
+        """Drop the staging tables of an ingest that will not be committed."""
+        try:
+            with self.backend.transaction() as cursor:
+                cursor.execute("DROP TABLE IF EXISTS assessments_staging")
+                cursor.execute("DROP TABLE IF EXISTS assessment_vectors_staging")
             return True
         except Exception as e:
-            logging.error(f"Error saving to SQLite database: {e}")
+            logging.error(f"Error discarding staged assessments: {e}")
             return False
     
     def _save_to_csv(self, df: pd.DataFrame) -> bool:
         """Save assessment data to CSV file with serialized embeddings."""
         try:
-            # Make a copy of the dataframe
-            save_df = df.copy()
+            # Make a copy of the dataframe (per-field vectors are only kept in the database)
+            save_df = df.drop(columns=['segments'], errors='ignore')
             
             # Convert embeddings to JSON strings for storage
             save_df['embedding'] = save_df['embedding'].apply(
@@ -124,34 +366,31 @@ class AssessmentDatabase:
         Load assessment data with embeddings from storage.
         
         Returns:
-            pd.DataFrame: DataFrame containing assessment data with embeddings
+            pd.DataFrame: DataFrame containing assessment data with embeddings. Rows loaded from the
+            database also carry their 'id', which build_index() uses to attach per-field vectors;
+            saving to the database assigns fresh ids.
         """
-        if self.use_sqlite:
-            return self._load_from_sqlite()
+        if self.use_database:
+            return self._load_from_database()
         else:
             return self._load_from_csv()
     
-    def _load_from_sqlite(self) -> pd.DataFrame:
-        """Load assessment data from SQLite database."""
+    def _load_from_database(self) -> pd.DataFrame:
+        """Load assessment data from the database."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            
             # Query all assessment data
-            query = "SELECT name, url, description, remote_testing, irt_support, duration, test_type, embedding FROM assessments"
+            query = "SELECT id, name, url, description, remote_testing, irt_support, duration, test_type, embedding FROM assessments ORDER BY id"
             
             # Load data into DataFrame
-            df = pd.read_sql_query(query, conn)
+            df = self.backend.query_dataframe(query)
             
-            # Convert binary embedding data back to lists
-            df['embedding'] = df['embedding'].apply(
-                lambda x: pickle.loads(x) if x is not None else None
-            )
+            # Convert stored embedding data back to lists
+            df['embedding'] = df['embedding'].apply(self.backend.decode_embedding)
             
-            conn.close()
-            logging.info(f"Loaded {len(df)} assessments from SQLite database")
+            logging.info(f"Loaded {len(df)} assessments from database")
             return df
         except Exception as e:
-            logging.error(f"Error loading from SQLite database: {e}")
+            logging.error(f"Error loading from database: {e}")
             return pd.DataFrame()
     
     def _load_from_csv(self) -> pd.DataFrame:
@@ -174,24 +413,327 @@ class AssessmentDatabase:
             logging.error(f"Error loading from CSV: {e}")
             return pd.DataFrame()
 
+    def load_segments(self) -> pd.DataFrame:
+        """
+        Load the per-field vectors of all assessments.
+        
+        Returns:
+            pd.DataFrame: 'assessment_id', 'field' and 'embedding' rows, ordered by assessment
+        """
+        if not self.use_database:
+            return pd.DataFrame(columns=['assessment_id', 'field', 'embedding'])
+        try:
+            df = self.backend.query_dataframe(
+                "SELECT assessment_id, field, embedding FROM assessment_vectors ORDER BY assessment_id, ordinal"
+            )
+            df['embedding'] = df['embedding'].apply(self.backend.decode_embedding)
+            return df
+        except Exception as e:
+            logging.error(f"Error loading per-field vectors from database: {e}")
+            return pd.DataFrame(columns=['assessment_id', 'field', 'embedding'])
+    
+    def build_index(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Build the scoring matrices for assessments with embeddings, applying the stored reducer.
+        
+        Args:
+            df (pd.DataFrame): Assessments whose 'embedding' is set, as returned by load_assessments()
+            
+        Returns:
+            Dict: 'vectors' (raw, n x dim), 'index' (reduced and L2-normalized, n x index_dim), 'reducer',
+            and 'segments' / 'offsets' (flattened per-field matrix and per-assessment start rows, or None)
+        """
+        vectors = np.vstack(df['embedding'].to_numpy()).astype(np.float32)
+        
+        # Apply the reduction stage fitted at ingestion time, if any
+        reducer = self.load_reducer()
+        if reducer is not None and reducer.input_dim != vectors.shape[1]:
+            logging.warning("Stored reducer does not match the catalog dimension; using full vectors")
+            reducer = None
+        
+        def project(matrix):
+            return normalize_rows(reducer.transform(matrix) if reducer is not None else matrix).astype(np.float32)
+        
+        segments, offsets = None, None
+        stored = self.load_segments() if 'id' in df.columns else pd.DataFrame()
+        if not stored.empty:
+            segments, offsets = build_segment_matrix(df['id'].to_numpy(), vectors, stored)
+            segments = project(segments)
+            logging.info(f"Built multi-vector index with {len(segments)} vectors for {len(df)} assessments")
+        
+        return {
+            'vectors': vectors,
+            'index': project(vectors),
+            'reducer': reducer,
+            'segments': segments,
+            'offsets': offsets,
+        }
+    
+    def save_reducer(self, reducer: EmbeddingReducer) -> bool:
+        """
+        Store a fitted embedding reducer next to the catalog vectors.
+        
+        Args:
+            reducer (EmbeddingReducer): Fitted reducer
+            
+        Returns:
+            bool: Success status
+        """
+        try:
+            with self.backend.transaction() as cursor:
+                cursor.execute("DELETE FROM embedding_reducer")
+                cursor.execute(self.backend.sql('''
+                INSERT INTO embedding_reducer (id, method, n_components, state)
+                VALUES (1, ?, ?, ?)
+                '''), (reducer.method, reducer.n_components, pickle.dumps(reducer.to_dict())))
+                self._bump_revision(cursor)
+            logging.info(f"Saved {reducer.method} reducer ({reducer.n_components} dimensions) to database")
+            return True
+        except Exception as e:
+            logging.error(f"Error saving reducer to database: {e}")
+            return False
+    
+    def load_reducer(self) -> Optional[EmbeddingReducer]:
+        """
+        Load the fitted embedding reducer, if one has been stored.
+        
+        Returns:
+            Optional[EmbeddingReducer]: The reducer, or None if reduction is disabled
+        """
+        try:
+            rows = self.backend.query("SELECT state FROM embedding_reducer WHERE id = 1")
+            return EmbeddingReducer.from_dict(pickle.loads(rows[0][0])) if rows else None
+        except Exception as e:
+            logging.error(f"Error loading reducer from database: {e}")
+            return None
+    
+    def clear_reducer(self) -> bool:
+        """Remove the stored reducer so that full-dimension vectors are used."""
+        try:
+            with self.backend.transaction() as cursor:
+                cursor.execute("DELETE FROM embedding_reducer")
+                self._bump_revision(cursor)
+            return True
+        except Exception as e:
+            logging.error(f"Error clearing reducer from database: {e}")
+            return False
+    
+    def export_snapshot(self, path: str = DEFAULT_SNAPSHOT_PATH) -> bool:
+        """
+        Export the catalog as a new columnar snapshot version for fast cold starts.
+        Each export is written to its own directory under `path` and published by atomically
+        replacing the CURRENT pointer file, so readers never see a half-written snapshot.
+        
+        Layout of a version directory:
+            metadata.arrow  Arrow IPC file with the assessment metadata columns
+            vectors.npy     float32 (n, dim) raw embeddings
+            index.npy       float32 (n, index_dim) scoring matrix (reduced and L2-normalized)
+            segments.npy    float32 (total, index_dim) per-field vectors of all assessments, if stored
+            offsets.npy     int64 (n,) first row of each assessment in segments.npy
+            reducer.pkl     Fitted reducer state, if reduction is enabled
+            manifest.json   Version, counts, dimensions, format version and the database revision
+        
+        Args:
+            path (str): Snapshot root directory
+            
+        Returns:
+            bool: Success status
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:
+            logging.error("pyarrow is required to export catalog snapshots")
+            return False
+        
+        try:
+            # Read before the catalog: a write racing the export leaves the snapshot marked stale
+            revision = self.catalog_revision()
+            df = self.load_assessments()
+            df = df[df['embedding'].notna()].reset_index(drop=True) if not df.empty else df
+            if df.empty:
+                logging.error("No embeddings available to export a snapshot")
+                return False
+            
+            built = self.build_index(df)
+            vectors, index, reducer = built['vectors'], built['index'], built['reducer']
+            segments, offsets = built['segments'], built['offsets']
+            
+            metadata = df[[c for c in ASSESSMENT_COLUMNS if c != 'embedding']].astype(object)
+            table = pa.Table.from_pandas(metadata.where(metadata.notna(), None), preserve_index=False)
+            
+            # Snapshots from before versioning kept their files directly in `path`
+            if os.path.exists(os.path.join(path, 'manifest.json')):
+                shutil.rmtree(path)
+            
+            digest = hashlib.sha1(index.tobytes()).hexdigest()[:8]
+            version = f"{time.strftime('%Y%m%d%H%M%S')}-{digest}"
+            version_path = os.path.join(path, version)
+            tmp_path = f"{version_path}.tmp"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+            
+            with pa.OSFile(os.path.join(tmp_path, 'metadata.arrow'), 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            np.save(os.path.join(tmp_path, 'vectors.npy'), vectors)
+            np.save(os.path.join(tmp_path, 'index.npy'), index)
+            if segments is not None:
+                np.save(os.path.join(tmp_path, 'segments.npy'), segments)
+                np.save(os.path.join(tmp_path, 'offsets.npy'), offsets)
+            if reducer is not None:
+                with open(os.path.join(tmp_path, 'reducer.pkl'), 'wb') as f:
+                    pickle.dump(reducer.to_dict(), f)
+            with open(os.path.join(tmp_path, 'manifest.json'), 'w') as f:
+                json.dump({
+                    'format_version': SNAPSHOT_FORMAT_VERSION,
+                    'version': version,
+                    'count': len(df),
+                    'dim': vectors.shape[1],
+                    'index_dim': index.shape[1],
+                    'segments': len(segments) if segments is not None else None,
+                    'reducer': reducer.method if reducer is not None else None,
+                    'db_revision': revision,
+                    'created_at': time.time(),
+                }, f)
+            
+            shutil.rmtree(version_path, ignore_errors=True)
+            os.replace(tmp_path, version_path)
+            
+            # Publish the new version
+            pointer_tmp = os.path.join(path, 'CURRENT.tmp')
+            with open(pointer_tmp, 'w') as f:
+                f.write(version)
+            os.replace(pointer_tmp, os.path.join(path, 'CURRENT'))
+            logging.info(f"Exported snapshot version {version} of {len(df)} assessments to {path}")
+            
+            self._prune_snapshots(path, version)
+            return True
+        except Exception as e:
+            logging.error(f"Error exporting catalog snapshot: {e}")
+            return False
+    
+    def _prune_snapshots(self, path: str, current: str):
+        """
+        Remove all but the newest SNAPSHOT_KEEP_VERSIONS versions (workers may still map older files).
+        Versions are ordered by their manifest's creation time; version names only have second
+        resolution and end in a digest, so two exports within a second would sort arbitrarily.
+        """
+        def created_at(name):
+            try:
+                with open(os.path.join(path, name, 'manifest.json')) as f:
+                    return float(json.load(f)['created_at'])
+            except (OSError, ValueError, KeyError, TypeError):
+                return os.path.getmtime(os.path.join(path, name))
+        
+        versions = sorted(
+            (name for name in os.listdir(path)
+             if os.path.isdir(os.path.join(path, name)) and not name.endswith('.tmp') and name != current),
+            key=created_at, reverse=True
+        )
+        for name in versions[max(0, SNAPSHOT_KEEP_VERSIONS - 1):]:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+    
+    def load_snapshot(self, path: str = DEFAULT_SNAPSHOT_PATH, version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Load a columnar catalog snapshot without per-row Python object construction.
+        The metadata is read from a memory-mapped Arrow file into plain object columns (missing
+        values are None, as when loading from the database) and the matrices are memory-mapped
+        NumPy arrays, so cold start cost is mostly page cache reads shared between workers.
+        
+        Args:
+            path (str): Snapshot root directory written by export_snapshot()
+            version (str): Version to load (defaults to the CURRENT one)
+            
+        Returns:
+            Optional[Dict]: 'version', 'metadata' DataFrame, 'vectors', 'index', 'segments' and 'offsets'
+            arrays (the last two None without per-field vectors), 'reducer' and 'manifest';
+            None if no usable snapshot exists
+        """
+        version = version or snapshot_version(path)
+        if version is None:
+            return None
+        path = os.path.join(path, version)
+        
+        try:
+            import pyarrow as pa
+            
+            with open(os.path.join(path, 'manifest.json')) as f:
+                manifest = json.load(f)
+            if manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+                logging.warning(f"Ignoring snapshot at {path} with unsupported format version")
+                return None
+            
+            table = pa.ipc.open_file(pa.memory_map(os.path.join(path, 'metadata.arrow'))).read_all()
+            metadata = table.to_pandas().astype(object)
+            metadata = metadata.where(metadata.notna(), None)
+            vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r')
+            index = np.load(os.path.join(path, 'index.npy'), mmap_mode='r')
+            segments, offsets = None, None
+            if manifest.get('segments'):
+                segments = np.load(os.path.join(path, 'segments.npy'), mmap_mode='r')
+                offsets = np.load(os.path.join(path, 'offsets.npy'))
+            
+            reducer = None
+            reducer_path = os.path.join(path, 'reducer.pkl')
+            if os.path.exists(reducer_path):
+                with open(reducer_path, 'rb') as f:
+                    reducer = EmbeddingReducer.from_dict(pickle.load(f))
+            
+            consistent = len(metadata) == len(vectors) == len(index) == manifest['count']
+            if segments is not None:
+                consistent = consistent and len(offsets) == len(index) and len(segments) == manifest['segments']
+            if not consistent:
+                logging.error(f"Snapshot at {path} is inconsistent; ignoring it")
+                return None
+            
+            logging.info(f"Loaded snapshot of {len(metadata)} assessments from {path}")
+            return {
+                'version': version,
+                'metadata': metadata,
+                'vectors': vectors,
+                'index': index,
+                'segments': segments,
+                'offsets': offsets,
+                'reducer': reducer,
+                'manifest': manifest,
+            }
+        except Exception as e:
+            logging.error(f"Error loading catalog snapshot: {e}")
+            return None
+
 if __name__ == "__main__":
-    # For testing
-    db = AssessmentDatabase()
-    # Create sample data
-    data = {
-        'name': ['Test Assessment'],
-        'url': ['https://example.com'],
-        'description': ['This is a test assessment'],
-        'remote_testing': ['Yes'],
-        'irt_support': ['No'],
-        'duration': ['30 minutes'],
-        'test_type': ['Cognitive Assessment'],
-        'embedding': [[0.1, 0.2, 0.3, 0.4]]
-    }
-    df = pd.DataFrame(data)
-    
-    # Test saving and loading
-    db.save_assessments(df)
-    loaded_df = db.load_assessments()
-    print("Loaded data:")
-    print(loaded_df)
+    # Round-trip check in a scratch directory: database -> snapshot -> JSON-ready records
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db = AssessmentDatabase(db_path=os.path.join(tmp, 'check.db'))
+        data = {
+            'name': ['Test Assessment', 'Sparse Assessment'],
+            'url': ['https://example.com', None],
+            'description': ['This is a test assessment', None],
+            'remote_testing': ['Yes', None],
+            'irt_support': ['No', None],
+            'duration': ['30 minutes', None],
+            'test_type': ['Cognitive Assessment', None],
+            'embedding': [[0.1, 0.2, 0.3, 0.4], [0.4, 0.3, 0.2, 0.1]]
+        }
+        df = pd.DataFrame(data)
+        
+        assert db.save_assessments(df)
+        loaded_df = db.load_assessments()
+        print("Loaded data:")
+        print(loaded_df)
+        
+        snapshot_path = os.path.join(tmp, 'snapshot')
+        assert db.export_snapshot(snapshot_path)
+        snapshot = db.load_snapshot(snapshot_path)
+        assert db.snapshot_is_current(snapshot)
+        records = snapshot['metadata'].to_dict('records')
+        expected = [{column: data[column][i] for column in ASSESSMENT_COLUMNS if column != 'embedding'}
+                    for i in range(len(df))]
+        assert records == expected, records
+        json.dumps(records)
+        
+        assert db.save_assessments(df.head(1))
+        assert not db.snapshot_is_current(snapshot), "snapshot not marked stale after a write"
+        print("Snapshot round trip passed")
@@ -2,24 +2,76 @@ import os
 import logging
 import numpy as np
 import pandas as pd
-from typing import List, Optional
-import google.generativeai as genai
-from google.generativeai import types
+from typing import List, Optional, Tuple
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+from chunking import chunk_query, chunk_text, normalize_text
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Catalog items are also embedded per field: name, short description and detailed-description chunks
+SEGMENT_FIELDS = ('name', 'short_description', 'detail')
+SHORT_DESCRIPTION_CHARS = 300
+CATALOG_CHUNK_CHARS = int(os.getenv("CATALOG_CHUNK_CHARS", 1000))
+CATALOG_MAX_CHUNKS = int(os.getenv("CATALOG_MAX_CHUNKS", 8))
+
+# Texts per embed_content request accepted by the batch embedding endpoint
+MAX_BATCH_SIZE = 100
+
+def assessment_text(record) -> str:
+    """Text used to embed a catalog item."""
+    return f"{record['name']} - {record['description']}"
+
+def assessment_segments(record) -> List[Tuple[str, str]]:
+    """
+    Per-field texts of a catalog item, as (field, text) pairs: its name, the short description
+    (the catalog card text, which the scraper puts first) and chunks of the rest of the description.
+    """
+    segments = []
+    name = record.get('name')
+    if isinstance(name, str) and name.strip():
+        segments.append(('name', name.strip()))
+
+    description = record.get('description')
+    if not isinstance(description, str):
+        return segments
+    description = normalize_text(description).replace('\n', ' ')
+    if not description:
+        return segments
+
+    # The first sentence or so, cut on a word boundary
+    short = chunk_text(description, SHORT_DESCRIPTION_CHARS)[0]
+    segments.append(('short_description', short))
+
+    detail = description[len(short):].strip()
+    if detail:
+        chunks = chunk_text(detail, CATALOG_CHUNK_CHARS)[:CATALOG_MAX_CHUNKS]
+        segments.extend(('detail', chunk) for chunk in chunks)
+    return segments
+
 class EmbeddingGenerator:
     """
     Generates text embeddings using Google's Generative AI (text-embedding-004).
     """
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, client=None):
+        """
+        Args:
+            api_key (str): Google API key (defaults to GOOGLE_API_KEY)
+            client: An already configured client to use instead of setting up the Gemini SDK,
+                e.g. the client of a wrapped generator; skips the API key lookup
+        """
+        if client is not None:
+            self.api_key = api_key
+            self.client = client
+            return
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
             logging.warning("No Google API key found.")
             self.client = None
         else:
             try:
+                # Imported lazily: the SDK is slow to import and only needed when embedding
+                import google.generativeai as genai
                 genai.configure(api_key=self.api_key)
                 self.client = genai
                 logging.info("Successfully initialized Gemini embedding client")
@@ -48,34 +100,114 @@ class EmbeddingGenerator:
             logging.error(f"Error generating embedding: {e}")
             raise
 
+    def generate_embeddings_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embed several texts with as few API calls as possible (MAX_BATCH_SIZE texts per call).
+        
+        Args:
+            texts (List[str]): Texts to embed
+            
+        Returns:
+            List: One embedding per input text (None for empty texts)
+        """
+        if not self.client:
+            logging.error("Embedding client not available.")
+            return [None] * len(texts)
+
+        positions = [i for i, text in enumerate(texts) if text and text.strip()]
+        embeddings = [None] * len(texts)
+        for start in range(0, len(positions), MAX_BATCH_SIZE):
+            batch = positions[start:start + MAX_BATCH_SIZE]
+            for i, embedding in zip(batch, self._embed_request([texts[i] for i in batch])):
+                embeddings[i] = embedding
+        return embeddings
+
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+    def _embed_request(self, texts: List[str]) -> List[List[float]]:
+        """Embed up to MAX_BATCH_SIZE non-empty texts, retrying failed calls (for ingestion)."""
+        try:
+            return self._embed_call(texts)
+        except Exception as e:
+            logging.error(f"Error generating batch embeddings: {e}")
+            raise
+
+    def _embed_call(self, texts: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        """Embed up to MAX_BATCH_SIZE non-empty texts in a single API call, without retries."""
+        result = self.client.embed_content(
+            model="models/text-embedding-004",
+            content=texts,
+            request_options={"timeout": timeout} if timeout else None
+        )
+        return result["embedding"]
+
+    def generate_record_embeddings(self, records: List[dict]) -> None:
+        """
+        Embed catalog records in place: 'embedding' gets the whole-item vector and 'segments'
+        the (field, embedding) pairs of assessment_segments(), all in batched calls.
+        """
+        texts = []
+        spans = []
+        for record in records:
+            segments = assessment_segments(record)
+            spans.append((len(texts), segments))
+            texts.append(assessment_text(record))
+            texts.extend(text for _, text in segments)
+
+        embeddings = self.generate_embeddings_batch(texts)
+        for record, (start, segments) in zip(records, spans):
+            record['embedding'] = embeddings[start]
+            record['segments'] = [
+                (field, embedding)
+                for (field, _), embedding in zip(segments, embeddings[start + 1:start + 1 + len(segments)])
+                if embedding is not None
+            ]
+
     def generate_embeddings_for_assessments(self, df: pd.DataFrame) -> pd.DataFrame:
         if not self.client:
             logging.error("Embedding client not initialized.")
             return df
 
-        result_df = df.copy()
-        result_df['embedding'] = None
-
-        for idx, row in result_df.iterrows():
-            text_to_embed = f"{row['name']} - {row['description']}"
-            if not text_to_embed.strip():
-                logging.warning(f"Empty text at index {idx}")
-                continue
-
+        # A failed group only loses its own records; its texts still go out MAX_BATCH_SIZE per call
+        records = df.to_dict('records')
+        for start in range(0, len(records), MAX_BATCH_SIZE):
+            batch = records[start:start + MAX_BATCH_SIZE]
             try:
-                embedding = self.generate_embedding(text_to_embed)
-                if embedding:
-                    result_df.at[idx, 'embedding'] = embedding
-                    logging.info(f"Generated embedding for: {row['name']}")
-                else:
-                    logging.warning(f"Failed to generate embedding for: {row['name']}")
+                self.generate_record_embeddings(batch)
+                logging.info(f"Generated embeddings for {len(batch)} assessments")
             except Exception as e:
-                logging.error(f"Exception for {row['name']}: {e}")
+                logging.error(f"Exception embedding assessments {start}-{start + len(batch)}: {e}")
+                for record in batch:
+                    record['embedding'] = None
+                    record['segments'] = []
         
+        result_df = df.copy()
+        result_df['embedding'] = [record.get('embedding') for record in records]
+        result_df['segments'] = [record.get('segments') or [] for record in records]
         return result_df
 
-    def generate_embedding_for_query(self, query: str) -> Optional[List[float]]:
-        return self.generate_embedding(query)
+    def embed_query_chunks(self, query: str, timeout: Optional[float] = None) -> List[List[float]]:
+        """
+        Embed a query as one vector per chunk, in a single call without retries that raises on
+        failure, for serving paths that bound and count failures themselves (the recommender's
+        circuit breaker). Long job descriptions are normalized and chunked instead of being
+        truncated by the model.
+        
+        Args:
+            query (str): Job description or natural language query
+            timeout (float): Seconds to wait for the API
+            
+        Returns:
+            List: Embeddings of the query chunks (empty without a client or for an empty query)
+        """
+        if not self.client:
+            logging.error("Embedding client not available.")
+            return []
+
+        chunks = chunk_query(query)
+        if not chunks:
+            logging.warning("Empty text provided for embedding generation")
+            return []
+        return [e for e in self._embed_call(chunks, timeout) if e]
 
 if __name__ == "__main__":
     generator = EmbeddingGenerator(api_key='your-google-api-key-here')
@@ -0,0 +1,435 @@
+import os
+import re
+import json
+import time
+import zlib
+import pickle
+import hashlib
+import logging
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Sequence
+
+from database import AssessmentDatabase
+from embeddings import EmbeddingGenerator
+from lexical import tokenize
+from reduction import EmbeddingReducer
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+REPORT_FORMAT_VERSION = 1
+DEFAULT_K = (1, 3, 5, 10)
+DEFAULT_CACHE_PATH = 'embedding_cache.pkl'
+
+# Engine configurations compared by default; each key maps to AssessmentRecommender settings
+ENGINE_CONFIGS = {
+    'baseline': {},
+    'single-vector': {'multi_vector': False},
+    'pca-128': {'reduce_dim': 128, 'reduction_method': 'pca'},
+    'pca-64': {'reduce_dim': 64, 'reduction_method': 'pca'},
+    'random-128': {'reduce_dim': 128, 'reduction_method': 'random'},
+    'mean-pooling': {'pooling': 'mean'},
+    'mmr-0.7': {'diversity_lambda': 0.7},
+}
+
+class HashingEmbeddingClient:
+    """
+    Stand-in for the Gemini client: embed_content() returns the sum of a fixed random vector
+    per lowercase token (feature hashing), or None for a text without tokens.
+    """
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self._tokens = {}
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        vector = self._tokens.get(token)
+        if vector is None:
+            rng = np.random.default_rng(zlib.crc32(token.encode()))
+            vector = self._tokens[token] = rng.standard_normal(self.dim).astype(np.float32)
+        return vector
+
+    def _embed(self, text: str) -> Optional[List[float]]:
+        tokens = tokenize(text)
+        if not tokens:
+            return None
+        return np.sum([self._token_vector(token) for token in tokens], axis=0).tolist()
+
+    def embed_content(self, model: str, content, request_options=None) -> Dict[str, Any]:
+        if isinstance(content, str):
+            return {"embedding": self._embed(content)}
+        return {"embedding": [self._embed(text) for text in content]}
+
+
+class StubEmbeddingGenerator(EmbeddingGenerator):
+    """
+    Deterministic offline embeddings from a HashingEmbeddingClient. Texts sharing words get
+    similar vectors, so rankings are meaningful enough to compare engine configurations
+    without calling the embedding API.
+    """
+    def __init__(self, dim: int = 256):
+        super().__init__(client=HashingEmbeddingClient(dim))
+        self.dim = dim
+
+
+class EmbeddingCacheClient:
+    """
+    Stand-in for the Gemini client that serves embeddings from a local cache keyed by text.
+    Misses are fetched from `generator` (when recording) and stored; without one they raise KeyError.
+    """
+    def __init__(self, cache_path: str = DEFAULT_CACHE_PATH, generator: Optional[EmbeddingGenerator] = None):
+        self.cache_path = cache_path
+        self.generator = generator
+        self.misses = 0
+        self._dirty = False
+        self.cache = {}
+        if os.path.exists(cache_path):
+            with open(cache_path, 'rb') as f:
+                self.cache = pickle.load(f)
+            logging.info(f"Loaded {len(self.cache)} cached embeddings from {cache_path}")
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def embed_content(self, model: str, content, request_options=None) -> Dict[str, Any]:
+        if isinstance(content, str):
+            return {"embedding": self.embed_content(model, [content])["embedding"][0]}
+        keys = [self._key(text) for text in content]
+        missing = [i for i, key in enumerate(keys) if key not in self.cache]
+        if missing:
+            self.misses += len(missing)
+            if self.generator is None:
+                raise KeyError(f"{len(missing)} texts are not in the embedding cache {self.cache_path}; "
+                               f"run once with --record to fill it")
+            fetched = self.generator.generate_embeddings_batch([content[i] for i in missing])
+            for i, embedding in zip(missing, fetched):
+                if embedding is not None:
+                    self.cache[keys[i]] = embedding
+                    self._dirty = True
+        return {"embedding": [self.cache.get(key) for key in keys]}
+
+    def save(self):
+        """Write newly recorded embeddings back to the cache file."""
+        if not self._dirty:
+            return
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self.cache, f)
+        os.replace(tmp_path, self.cache_path)
+        self._dirty = False
+        logging.info(f"Saved {len(self.cache)} embeddings to {self.cache_path}")
+
+
+class CachedEmbeddingGenerator(EmbeddingGenerator):
+    """
+    Embeddings served from an EmbeddingCacheClient, so later runs are fully offline and reproducible.
+    """
+    def __init__(self, cache_path: str = DEFAULT_CACHE_PATH, generator: Optional[EmbeddingGenerator] = None):
+        super().__init__(client=EmbeddingCacheClient(cache_path, generator))
+
+    def generate_embedding(self, text: str) -> Optional[List[float]]:
+        # Not retried: a cache miss without a recording generator will not go away
+        return self._embed_call([text])[0]
+
+    def save(self):
+        self.client.save()
+
+
+def load_labelled_queries(path: str) -> List[Dict[str, Any]]:
+    """
+    Load labelled queries from a .json list or a .jsonl file.
+    Each entry is {"query": "...", "relevant": ["Assessment name", ...]}.
+    """
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            entries = [json.loads(line) for line in f if line.strip()]
+        else:
+            entries = json.load(f)
+    queries = []
+    for entry in entries:
+        relevant = entry.get('relevant') or []
+        if isinstance(relevant, str):
+            relevant = [relevant]
+        if entry.get('query') and relevant:
+            queries.append({'query': entry['query'], 'relevant': list(relevant)})
+    return queries
+
+
+def synthetic_queries(catalog: pd.DataFrame, n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Self-retrieval queries for smoke runs without a labelled set: a sentence from an
+    assessment's description, labelled with that assessment.
+    """
+    rng = np.random.default_rng(seed)
+    candidates = catalog[catalog['description'].fillna('').str.len() > 40]
+    queries = []
+    for idx in rng.permutation(len(candidates))[:n]:
+        row = candidates.iloc[idx]
+        sentences = [s for s in re.split(r'(?<=[.!?])\s+', row['description']) if len(s) > 20]
+        if sentences:
+            queries.append({'query': sentences[rng.integers(len(sentences))], 'relevant': [row['name']]})
+    return queries
+
+
+def _normalize_name(name: str) -> str:
+    return ' '.join(str(name).lower().split())
+
+
+def ranking_metrics(ranked: Sequence[str], relevant: Sequence[str], ks: Sequence[int]) -> Dict[str, float]:
+    """Recall@k, MAP@k (average precision) and NDCG@k with binary relevance for one query."""
+    relevant = {_normalize_name(name) for name in relevant}
+    hits = np.array([_normalize_name(name) in relevant for name in ranked], dtype=bool)
+    metrics = {}
+    for k in ks:
+        top = hits[:k]
+        metrics[f'recall@{k}'] = int(top.sum()) / len(relevant)
+        precision_at_hits = np.cumsum(top)[top] / (np.flatnonzero(top) + 1)
+        metrics[f'map@{k}'] = float(precision_at_hits.sum()) / min(len(relevant), k)
+        discounts = 1.0 / np.log2(np.arange(2, k + 2))
+        ideal = discounts[:min(len(relevant), k)].sum()
+        metrics[f'ndcg@{k}'] = float((top * discounts[:len(top)]).sum() / ideal)
+    return metrics
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples) * 1000
+    return {
+        'p50': round(float(np.percentile(values, 50)), 3),
+        'p95': round(float(np.percentile(values, 95)), 3),
+        'mean': round(float(values.mean()), 3),
+    }
+
+
+def _rss_mb() -> Optional[float]:
+    """Current resident set size of this process (Linux), in MB."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return None
+
+
+def load_catalog(database: AssessmentDatabase) -> pd.DataFrame:
+    """The stored catalog with its per-field vectors attached as a 'segments' column."""
+    df = database.load_assessments()
+    segments = database.load_segments()
+    if 'id' in df.columns and not segments.empty:
+        grouped = {
+            assessment_id: list(zip(group['field'], group['embedding']))
+            for assessment_id, group in segments.groupby('assessment_id', sort=False)
+        }
+        df['segments'] = [grouped.get(assessment_id, []) for assessment_id in df['id']]
+    return df.drop(columns=['id'], errors='ignore')
+
+
+class EvaluationHarness:
+    """
+    Runs a labelled query set through AssessmentRecommender under several engine configurations
+    and reports ranking quality next to latency and memory, as comparable JSON.
+    """
+    def __init__(self, catalog: pd.DataFrame, queries: List[Dict[str, Any]],
+                 embedding_generator: EmbeddingGenerator, ks: Sequence[int] = DEFAULT_K,
+                 repeat: int = 3, warmup: int = 5):
+        """
+        Args:
+            catalog (pd.DataFrame): Assessments with 'embedding' (and optionally 'segments')
+                produced by the same embedding_generator used for queries
+            queries (List[Dict]): Labelled queries, see load_labelled_queries()
+            embedding_generator (EmbeddingGenerator): Offline query embeddings (stub or cached)
+            ks (Sequence[int]): Cut-offs for the ranking metrics
+            repeat (int): Timed passes over the query set per configuration
+            warmup (int): Untimed queries before timing
+        """
+        self.catalog = catalog[catalog['embedding'].notna()].reset_index(drop=True)
+        self.embedding_generator = embedding_generator
+        self.ks = sorted(ks)
+        self.repeat = repeat
+        self.warmup = warmup
+
+        names = {_normalize_name(name) for name in self.catalog['name']}
+        self.queries = []
+        for query in queries:
+            relevant = [name for name in query['relevant'] if _normalize_name(name) in names]
+            if relevant:
+                self.queries.append({'query': query['query'], 'relevant': relevant})
+        self.unmatched = len(queries) - len(self.queries)
+        if self.unmatched:
+            logging.warning(f"{self.unmatched} labelled queries have no relevant assessment in the catalog; skipped")
+
+    def _build_recommender(self, settings: Dict[str, Any], workdir: str):
+        from recommender import AssessmentRecommender
+
+        db = AssessmentDatabase(db_path=os.path.join(workdir, 'catalog.db'), csv_path=os.path.join(workdir, 'catalog.csv'))
+        catalog = self.catalog
+        if not settings.get('multi_vector', True):
+            catalog = catalog.drop(columns=['segments'], errors='ignore')
+        if not db.save_assessments(catalog):
+            raise RuntimeError("could not build the evaluation catalog")
+
+        if settings.get('reduce_dim'):
+            vectors = np.vstack(catalog['embedding'].to_numpy()).astype(np.float32)
+            n_components = min(settings['reduce_dim'], *vectors.shape)
+            db.save_reducer(EmbeddingReducer(n_components, settings.get('reduction_method', 'pca')).fit(vectors))
+
+        snapshot_path = os.path.join(workdir, 'snapshot')
+        if not db.export_snapshot(snapshot_path):
+            raise RuntimeError("could not export the evaluation snapshot")
+        # The snapshot never changes during a run, and every timed query should be embedded and
+        # ranked semantically: no query cache or role templates, and embedding errors propagate
+        # instead of falling back
+        return AssessmentRecommender(database=db, embedding_generator=self.embedding_generator,
+                                     snapshot_path=snapshot_path, watch=False, query_cache_size=0,
+                                     breaker=False, templates=False)
+
+    def evaluate(self, name: str, settings: Dict[str, Any]) -> Dict[str, Any]:
+        """Evaluate one engine configuration."""
+        top_n = max(self.ks)
+        rss_before = _rss_mb()
+        with tempfile.TemporaryDirectory() as workdir:
+            recommender = self._build_recommender(settings, workdir)
+            catalog = recommender.catalog.active
+            catalog_bytes = catalog.index.nbytes + (catalog.segments.nbytes if catalog.segments is not None else 0)
+
+            def run(query):
+                return recommender.recommend(query, top_n, settings.get('diversity_lambda'), settings.get('pooling'))
+
+            for query in self.queries[:self.warmup]:
+                run(query['query'])
+
+            # Quality and peak query memory in one traced pass; latency in untraced passes
+            totals = {}
+            tracemalloc.start()
+            for query in self.queries:
+                results = run(query['query'])
+                scores = ranking_metrics([r['name'] for r in results], query['relevant'], self.ks)
+                for metric, value in scores.items():
+                    totals[metric] = totals.get(metric, 0.0) + value
+            _, query_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            latencies = []
+            for _ in range(self.repeat):
+                for query in self.queries:
+                    start = time.perf_counter()
+                    run(query['query'])
+                    latencies.append(time.perf_counter() - start)
+            rss_after = _rss_mb()
+            recommender.database.close()
+
+        metrics = {metric: round(value / len(self.queries), 4) for metric, value in totals.items()}
+        logging.info(f"Evaluated '{name}': " + ", ".join(f"{m}={v:.3f}" for m, v in metrics.items() if m.endswith(f"@{top_n}")))
+        return {
+            'settings': settings,
+            'metrics': metrics,
+            'latency_ms': _percentiles(latencies),
+            'memory': {
+                'catalog_mb': round(catalog_bytes / 2 ** 20, 3),
+                'query_peak_mb': round(query_peak / 2 ** 20, 3),
+                'rss_mb': round(rss_after, 1) if rss_after is not None else None,
+                'rss_delta_mb': round(rss_after - rss_before, 1) if rss_after is not None else None,
+            },
+        }
+
+    def run(self, configs: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Evaluate every configuration and return the JSON-serializable report."""
+        if not self.queries:
+            raise ValueError("No labelled queries match the catalog")
+        multi_vector = 'segments' in self.catalog.columns
+        # Without per-field vectors a single-vector configuration would repeat its multi-vector twin
+        skipped = [name for name, settings in configs.items() if not multi_vector and settings.get('multi_vector') is False]
+        if skipped:
+            logging.warning(f"Catalog has no per-field vectors; skipping {', '.join(skipped)}")
+        return {
+            'format_version': REPORT_FORMAT_VERSION,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'queries': len(self.queries),
+            'skipped_queries': self.unmatched,
+            'catalog': {
+                'assessments': len(self.catalog),
+                'dim': len(self.catalog['embedding'].iloc[0]),
+                'multi_vector': multi_vector,
+            },
+            'k': self.ks,
+            'repeat': self.repeat,
+            'skipped_configs': skipped,
+            'configs': {name: self.evaluate(name, settings) for name, settings in configs.items()
+                        if name not in skipped},
+        }
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    """Print a report as a table, with deltas against a baseline report when given."""
+    k = max(report['k'])
+    columns = [f'recall@{k}', f'map@{k}', f'ndcg@{k}']
+    print(f"{report['queries']} queries, {report['catalog']['assessments']} assessments, "
+          f"embeddings: {report.get('embeddings', 'unknown')}")
+    print(f"{'config':<16}" + "".join(f"{c:>11}" for c in columns) + f"{'p50 ms':>10}{'p95 ms':>10}{'catalog MB':>12}")
+    for name, result in report['configs'].items():
+        cells = [f"{result['metrics'][c]:11.4f}" for c in columns]
+        previous = (baseline or {}).get('configs', {}).get(name)
+        if previous:
+            cells = [f"{result['metrics'][c] - previous['metrics'].get(c, 0.0):+11.4f}" for c in columns]
+        print(f"{name:<16}" + "".join(cells)
+              + f"{result['latency_ms']['p50']:10.2f}{result['latency_ms']['p95']:10.2f}{result['memory']['catalog_mb']:12.2f}")
+    if baseline:
+        print("(metric columns show the change against the baseline report)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Offline relevance and latency evaluation of the recommender')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--queries', help='Labelled queries (.json or .jsonl with "query" and "relevant")')
+    source.add_argument('--synthetic', type=int, metavar='N', help='Use N self-retrieval queries from the catalog')
+    parser.add_argument('--embeddings', choices=['stub', 'cached'], default='stub',
+                        help="'stub' re-embeds catalog and queries offline; 'cached' uses the stored catalog "
+                             "vectors and query embeddings from --cache")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='Query embedding cache for --embeddings cached')
+    parser.add_argument('--record', action='store_true', help='Fill cache misses from the embedding API')
+    parser.add_argument('--stub-dim', type=int, default=256)
+    parser.add_argument('--config', action='append', choices=ENGINE_CONFIGS,
+                        help='Configuration to evaluate (repeatable; defaults to all)')
+    parser.add_argument('--k', type=int, action='append', help='Metric cut-off (repeatable)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed passes over the queries')
+    parser.add_argument('--output', help='Write the JSON report here')
+    parser.add_argument('--baseline', help='Earlier JSON report to compare against')
+    args = parser.parse_args()
+
+    catalog = load_catalog(AssessmentDatabase())
+    if catalog.empty:
+        raise SystemExit("The catalog is empty; run the ingestion first")
+
+    if args.embeddings == 'stub':
+        generator = StubEmbeddingGenerator(args.stub_dim)
+        records = catalog.drop(columns=['embedding', 'segments'], errors='ignore').to_dict('records')
+        generator.generate_record_embeddings(records)
+        catalog = pd.DataFrame(records)
+    else:
+        generator = CachedEmbeddingGenerator(args.cache, EmbeddingGenerator() if args.record else None)
+
+    queries = load_labelled_queries(args.queries) if args.queries else synthetic_queries(catalog, args.synthetic)
+    configs = {name: ENGINE_CONFIGS[name] for name in (args.config or ENGINE_CONFIGS)}
+
+    # Keep per-configuration build logs out of the report output
+    logging.getLogger().setLevel(logging.WARNING)
+    harness = EvaluationHarness(catalog, queries, generator, ks=args.k or DEFAULT_K, repeat=args.repeat)
+    try:
+        report = harness.run(configs)
+    except KeyError as e:
+        raise SystemExit(e.args[0])
+    finally:
+        if isinstance(generator, CachedEmbeddingGenerator):
+            generator.save()
+    report['embeddings'] = args.embeddings
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
@@ -0,0 +1,232 @@
+import os
+import gc
+import sys
+import time
+import signal
+import logging
+import argparse
+import importlib
+import subprocess
+from typing import Dict, List, Optional
+
+from gunicorn.app.base import BaseApplication
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Serving targets for the production launcher
+TARGETS = {
+    'api': {
+        'app': 'api:app',
+        'bind': '0.0.0.0:8000',
+    },
+    'flask': {
+        'app': 'app:app',
+        'bind': '0.0.0.0:8000',
+        'worker_class': 'gthread',
+        'threads': 4,
+    },
+}
+
+STREAMLIT_CMD = ["streamlit", "run", "ui.py", "--server.port=5000", "--server.address=0.0.0.0"]
+
+
+def default_worker_count() -> int:
+    """Number of workers sized to the cores this process may run on."""
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+
+def _uvicorn_worker_class() -> str:
+    try:
+        import uvicorn_worker  # noqa: F401
+        return 'uvicorn_worker.UvicornWorker'
+    except ImportError:
+        # Deprecated in recent uvicorn releases, but still available
+        return 'uvicorn.workers.UvicornWorker'
+
+
+def _preload_catalog():
+    """Load the shared recommender in the current process and freeze it out of the GC."""
+    from recommender import get_shared_recommender
+
+    get_shared_recommender()
+    # Objects created so far are never scanned by the cyclic GC again, so forked
+    # workers do not dirty the shared pages by touching their GC headers
+    gc.collect()
+    gc.freeze()
+
+
+class CatalogApplication(BaseApplication):
+    """
+    Gunicorn application that preloads the catalog and index in the master before forking,
+    so workers share those pages copy-on-write. On SIGHUP the master reloads the catalog
+    and then replaces the workers gracefully.
+    """
+    def __init__(self, target: str, workers: int, bind: Optional[str] = None):
+        self.target = TARGETS[target]
+        self.options = {
+            'bind': bind or self.target['bind'],
+            'workers': workers,
+            'worker_class': self.target.get('worker_class') or _uvicorn_worker_class(),
+            'threads': self.target.get('threads', 1),
+            'preload_app': True,
+            'graceful_timeout': 30,
+            'on_reload': self._on_reload,
+        }
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        module_name, attr = self.target['app'].split(':')
+        app = getattr(importlib.import_module(module_name), attr)
+        _preload_catalog()
+        return app
+
+    @staticmethod
+    def _on_reload(server):
+        # Runs in the master before the replacement workers are forked
+        from recommender import get_shared_recommender
+
+        gc.unfreeze()
+        get_shared_recommender().refresh_data()
+        gc.collect()
+        gc.freeze()
+        server.log.info("Reloaded catalog in master; replacing workers")
+
+
+class ProcessSupervisor:
+    """
+    Runs named child processes, restarts them with backoff when they exit
+    and forwards shutdown signals to all of them.
+    """
+    def __init__(self, max_backoff: float = 30.0):
+        self.commands: Dict[str, List[str]] = {}
+        self.processes: Dict[str, subprocess.Popen] = {}
+        self.restart_at: Dict[str, float] = {}
+        self.backoff: Dict[str, float] = {}
+        self.started_at: Dict[str, float] = {}
+        self.max_backoff = max_backoff
+        self.stopping = False
+
+    def add(self, name: str, command: List[str]):
+        self.commands[name] = command
+        self.backoff[name] = 1.0
+        self._start(name)
+
+    def _start(self, name: str):
+        logging.info(f"Starting {name}: {' '.join(self.commands[name])}")
+        self.processes[name] = subprocess.Popen(self.commands[name])
+        self.started_at[name] = time.monotonic()
+        self.restart_at.pop(name, None)
+
+    def poll(self):
+        """Restart children that have exited, with exponential backoff."""
+        now = time.monotonic()
+        for name, process in list(self.processes.items()):
+            if name in self.restart_at:
+                if now >= self.restart_at[name]:
+                    self._start(name)
+                continue
+
+            code = process.poll()
+            if code is None:
+                # Healthy for a while: reset backoff
+                if now - self.started_at[name] > 60:
+                    self.backoff[name] = 1.0
+                continue
+            if self.stopping:
+                continue
+
+            delay = self.backoff[name]
+            logging.warning(f"{name} exited with code {code}; restarting in {delay:.0f}s")
+            self.restart_at[name] = now + delay
+            self.backoff[name] = min(delay * 2, self.max_backoff)
+
+    def signal(self, name: str, signum: int):
+        process = self.processes.get(name)
+        if process is not None and process.poll() is None:
+            process.send_signal(signum)
+
+    def stop(self, timeout: float = 30.0):
+        """Terminate all children, killing any that do not exit in time."""
+        self.stopping = True
+        for process in self.processes.values():
+            if process.poll() is None:
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for name, process in self.processes.items():
+            try:
+                process.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                logging.warning(f"{name} did not stop in time; killing it")
+                process.kill()
+
+
+def serve(target: str = 'api', workers: Optional[int] = None, bind: Optional[str] = None,
+          with_server: bool = True, with_ui: bool = True, poll_interval: float = 5.0):
+    """
+    Run the production serving stack: a preloaded multi-worker gunicorn server for `target`
+    and/or the Streamlit UI, both supervised. Workers pick up newly published catalog
+    snapshots by themselves; SIGHUP still forces a full graceful worker reload.
+
+    Args:
+        target (str): 'api' (FastAPI api:app) or 'flask' (Flask app:app)
+        workers (int): Number of workers (defaults to the available cores)
+        bind (str): Address to bind, e.g. '0.0.0.0:8000'
+        with_server (bool): Run the gunicorn server
+        with_ui (bool): Run the Streamlit UI
+        poll_interval (float): Seconds between child process checks
+    """
+    workers = workers or default_worker_count()
+    supervisor = ProcessSupervisor()
+
+    if with_server:
+        command = [sys.executable, os.path.abspath(__file__), 'gunicorn', '--target', target, '--workers', str(workers)]
+        if bind:
+            command += ['--bind', bind]
+        supervisor.add('server', command)
+    if with_ui:
+        supervisor.add('ui', STREAMLIT_CMD)
+
+    def handle_stop(signum, frame):
+        raise KeyboardInterrupt
+
+    def handle_reload(signum, frame):
+        supervisor.signal('server', signal.SIGHUP)
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGHUP, handle_reload)
+
+    try:
+        while True:
+            time.sleep(poll_interval)
+            supervisor.poll()
+    except KeyboardInterrupt:
+        logging.info("Shutting down")
+    finally:
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Production launcher for the recommendation servers')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    gunicorn_parser = subparsers.add_parser('gunicorn', help='Run a preloaded gunicorn server (used by serve)')
+    serve_parser = subparsers.add_parser('serve', help='Run the supervised serving stack')
+    for sub in (gunicorn_parser, serve_parser):
+        sub.add_argument('--target', choices=TARGETS, default='api')
+        sub.add_argument('--workers', type=int, default=None)
+        sub.add_argument('--bind', default=None)
+    serve_parser.add_argument('--no-ui', action='store_true', help='Do not run the Streamlit UI')
+
+    args = parser.parse_args()
+    if args.command == 'gunicorn':
+        CatalogApplication(args.target, args.workers or default_worker_count(), args.bind).run()
+    else:
+        serve(args.target, args.workers, args.bind, with_ui=not args.no_ui)
@@ -0,0 +1,60 @@
+import re
+import logging
+import numpy as np
+from collections import Counter
+from typing import List, Sequence
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+_TOKEN = re.compile(r"[a-z0-9+#]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, keeping '+' and '#' so terms like C++ and C# survive."""
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+class LexicalIndex:
+    """
+    Okapi BM25 over the catalog text. Used as the cheap fallback ranking when query
+    embeddings are unavailable; needs no API call and scores a query in well under a millisecond.
+    Postings are stored per term as contiguous slices of two flat arrays (CSR layout).
+    """
+    def __init__(self, documents: Sequence[str], k1: float = 1.2, b: float = 0.75):
+        self.size = len(documents)
+        counts = [Counter(tokenize(document)) for document in documents]
+        lengths = np.array([sum(c.values()) for c in counts], dtype=np.float32)
+        average_length = max(float(lengths.mean()) if self.size else 0.0, 1.0)
+
+        postings = {}
+        for doc_id, document_counts in enumerate(counts):
+            for term, count in document_counts.items():
+                postings.setdefault(term, []).append((doc_id, count))
+
+        self.vocabulary = {}
+        self.offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        doc_ids = []
+        weights = []
+        for term_id, (term, entries) in enumerate(postings.items()):
+            self.vocabulary[term] = term_id
+            ids = np.array([doc_id for doc_id, _ in entries], dtype=np.int64)
+            tf = np.array([count for _, count in entries], dtype=np.float32)
+            idf = np.log(1.0 + (self.size - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = k1 * (1.0 - b + b * lengths[ids] / average_length)
+            doc_ids.append(ids)
+            weights.append((idf * tf * (k1 + 1.0) / (tf + norm)).astype(np.float32))
+            self.offsets[term_id + 1] = self.offsets[term_id] + len(ids)
+        self.doc_ids = np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=np.int64)
+        self.weights = np.concatenate(weights) if weights else np.zeros(0, dtype=np.float32)
+
+    def score(self, query: str) -> np.ndarray:
+        """BM25 score of every document, scaled so the best match scores 1.0 (all zeros if nothing matches)."""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is not None:
+                start, end = self.offsets[term_id], self.offsets[term_id + 1]
+                # A term posts each document at most once, so fancy-index addition is safe
+                scores[self.doc_ids[start:end]] += self.weights[start:end]
+        best = scores.max() if self.size else 0.0
+        return scores / best if best > 0 else scores
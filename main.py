@@ -1,62 +1,149 @@
 import os
+import sys
+import shutil
 import logging
 import argparse
-import pandas as pd
-from scraper import scrape_and_save
-from embeddings import EmbeddingGenerator
-from database import AssessmentDatabase
-import api
-import uvicorn
 import subprocess
-from app import app  # Import Flask app for gunicorn
+
+# Heavy modules (numpy/pandas, reduction, scraper, embeddings, web frameworks) are imported lazily
+# inside the functions that need them, so each mode only pays for its own imports.
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def initialize_data(force_scrape=False):
+# Modules each startup mode needs, used by --import-profile
+MODE_MODULES = {
+    'api': ['database', 'api', 'uvicorn'],
+    'ui': ['database'],
+    'all': ['database', 'api', 'uvicorn'],
+    'app': ['database', 'app', 'launcher'],
+    'ingest': ['database', 'pipeline', 'scraper', 'embeddings'],
+}
+
+def fit_reduction(db, reduce_dim, method=None):
+    """
+    Fit the optional dimensionality reduction stage on the stored catalog.
+    
+    Args:
+        db (AssessmentDatabase): Database holding the catalog embeddings
+        reduce_dim (int): Target dimension; 0 removes any stored reducer
+        method (str): Reduction method ('pca' or 'random', defaults to EMBEDDING_REDUCTION_METHOD)
+    """
+    import numpy as np
+    from reduction import DEFAULT_REDUCTION_METHOD, EmbeddingReducer, holdout_ranking_agreement
+    
+    method = method or DEFAULT_REDUCTION_METHOD
+    if reduce_dim <= 0:
+        db.clear_reducer()
+        logging.info("Dimensionality reduction disabled; scoring with full vectors")
+        return True
+    
+    df = db.load_assessments()
+    df = df[df['embedding'].notna()] if not df.empty else df
+    if df.empty:
+        logging.error("No embeddings available to fit the reduction stage")
+        return False
+    
+    catalog = np.vstack(df['embedding'].to_numpy()).astype(np.float32)
+    if len(catalog) >= 2:
+        # Probes are held out of the fit and the searched catalog, so they are not their own top match
+        report = holdout_ranking_agreement(catalog, reduce_dim, method)
+        logging.info(
+            f"Reduction {report['full_dim']} -> {report['reduced_dim']} ({method}): "
+            f"held-out overlap@{report['k']}={report['overlap_at_k']:.3f}, top1={report['top1_agreement']:.3f}"
+        )
+    reducer = EmbeddingReducer(reduce_dim, method).fit(catalog)
+    return db.save_reducer(reducer)
+
+def reduction_is_current(db, reduce_dim, method=None):
+    """Whether the stored reducer already has the requested target dimension and method."""
+    from reduction import DEFAULT_REDUCTION_METHOD
+    
+    method = method or DEFAULT_REDUCTION_METHOD
+    stored = db.load_reducer()
+    if reduce_dim <= 0:
+        return stored is None
+    return stored is not None and stored.method == method and stored.target_dim == reduce_dim
+
+def initialize_data(force_scrape=False, reduce_dim=None, reduction_method=None):
     """
     Initialize the system by scraping data and generating embeddings if needed.
     
     Args:
         force_scrape (bool): Force scraping even if data exists
+        reduce_dim (int): Target dimension for the reduction stage (None keeps the stored setting)
+        reduction_method (str): Reduction method ('pca' or 'random', defaults to EMBEDDING_REDUCTION_METHOD)
     """
+    from database import AssessmentDatabase, DEFAULT_SNAPSHOT_PATH, snapshot_version
+    from reduction import DEFAULT_REDUCED_DIM
+    
+    if reduce_dim is None:
+        reduce_dim = DEFAULT_REDUCED_DIM or None
     db = AssessmentDatabase()
     csv_path = 'assessments.csv'
+    embeddings_path = 'assessments_with_embeddings.csv'
     
-    # Check if we need to scrape data
-    if force_scrape or not os.path.exists(csv_path):
-        logging.info("Scraping SHL product catalog...")
-        assessments_df = scrape_and_save(csv_path)
-        if assessments_df is None or assessments_df.empty:
-            logging.error("Failed to scrape assessment data")
-            return False
-    else:
-        logging.info(f"Loading existing assessment data from {csv_path}")
-        assessments_df = pd.read_csv(csv_path)
+    need_scrape = force_scrape or not os.path.exists(csv_path)
+    need_embed = force_scrape or not os.path.exists(embeddings_path)
     
-    # Generate embeddings if needed
-    embeddings_path = 'assessments_with_embeddings.csv'
-    if force_scrape or not os.path.exists(embeddings_path):
-        logging.info("Generating embeddings for assessments...")
-        
-        embedding_generator = EmbeddingGenerator()
+    if need_scrape or need_embed:
+        from pipeline import IngestionPipeline, read_records_from_csv
         
-        if embedding_generator.model is None:
-            logging.error("Failed to initialize embedding model. Check API key.")
-            return False
+        embedding_generator = None
+        if need_embed:
+            from embeddings import EmbeddingGenerator
+
+            embedding_generator = EmbeddingGenerator()
+            if embedding_generator.client is None:
+                logging.error("Failed to initialize embedding model. Check API key.")
+                return False
         
-        assessments_with_embeddings = embedding_generator.generate_embeddings_for_assessments(assessments_df)
+        # Scraped records flow straight into the batching embedder and the batched writer
+        if need_scrape:
+            from scraper import SHLCatalogScraper
+            logging.info("Scraping SHL product catalog...")
+            source = SHLCatalogScraper().iter_catalog(with_details=True)
+        else:
+            logging.info(f"Loading existing assessment data from {csv_path}")
+            source = read_records_from_csv(csv_path)
         
-        # Save to database
-        db.save_assessments(assessments_with_embeddings)
-        logging.info("Assessment data with embeddings saved to database")
+        pipeline = IngestionPipeline(db, embedding_generator)
+        if not pipeline.run(source, csv_path=csv_path if need_scrape else None):
+            logging.error("Failed to ingest assessment data")
+            return False
+        if need_embed:
+            logging.info("Assessment data with embeddings saved to database")
     else:
         logging.info("Assessment data with embeddings already exists in database")
     
+    # Refit only for new embeddings or a changed target dimension / method, not on every start
+    refit = reduce_dim is not None and (need_embed or not reduction_is_current(db, reduce_dim, reduction_method))
+    if refit and not fit_reduction(db, reduce_dim, reduction_method):
+        return False
+    
+    # Refresh the columnar snapshot that workers load at startup, also when the database was
+    # written since it was exported (pipeline.py run on its own, another host on a shared database)
+    snapshot = None if need_embed or refit else db.load_snapshot(DEFAULT_SNAPSHOT_PATH)
+    catalog_changed = snapshot is None or not db.snapshot_is_current(snapshot)
+    if catalog_changed:
+        if not db.export_snapshot(DEFAULT_SNAPSHOT_PATH):
+            # Never leave a stale snapshot in front of the database
+            shutil.rmtree(DEFAULT_SNAPSHOT_PATH, ignore_errors=True)
+            logging.warning("Catalog snapshot not exported; workers will load from the database")
+    
+    # Precompute recommendations for the canonical role templates against the snapshot version;
+    # a no-op once its table exists. Database-only catalogs (no snapshot) are not precomputed.
+    from role_templates import generate_template_table
+    if snapshot_version(DEFAULT_SNAPSHOT_PATH) is None:
+        logging.info("No catalog snapshot; skipping precomputed role template recommendations")
+    elif not generate_template_table(db, DEFAULT_SNAPSHOT_PATH):
+        logging.warning("Role template table not generated; every query will be scored individually")
+    
     return True
 
 def start_fastapi():
     """Start the FastAPI server."""
+    import uvicorn
     uvicorn.run("api:app", host="0.0.0.0", port=8000)
 
 def start_streamlit():
@@ -64,22 +151,84 @@ def start_streamlit():
     streamlit_cmd = ["streamlit", "run", "ui.py", "--server.port=5000", "--server.address=0.0.0.0"]
     subprocess.Popen(streamlit_cmd)
 
+def import_profile(mode, top=25):
+    """
+    Print the slowest imports for a startup mode, measured with `python -X importtime`
+    in a fresh interpreter so nothing is already cached in sys.modules.
+    
+    Args:
+        mode (str): One of MODE_MODULES
+        top (int): Number of modules to list
+    """
+    modules = MODE_MODULES[mode]
+    code = "import importlib\n" + "\n".join(f"importlib.import_module({m!r})" for m in modules)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True)
+    
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Top-level imports are indented by a single space, nested ones by more
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((int(cumulative_us), int(self_us), depth, name.strip()))
+    
+    if result.returncode != 0:
+        print(result.stderr.splitlines()[-1] if result.stderr else "Import failed")
+    
+    total_us = sum(cumulative for cumulative, _, depth, _ in rows if depth == 0)
+    print(f"Import profile for mode '{mode}' ({', '.join(modules)}): {total_us / 1000:.1f} ms total")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative, self_us, depth, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative / 1000:14.1f} {self_us / 1000:9.1f}  {'  ' * depth}{name}")
+
 def main():
     parser = argparse.ArgumentParser(description='SHL Assessment Recommendation System')
     parser.add_argument('--force-scrape', action='store_true', help='Force scraping of SHL catalog')
     parser.add_argument('--api-only', action='store_true', help='Start only the API server')
     parser.add_argument('--ui-only', action='store_true', help='Start only the UI server')
+    # Defaults come from EMBEDDING_REDUCED_DIM / EMBEDDING_REDUCTION_METHOD, resolved in reduction.py
+    # when data is initialized, so parsing arguments does not import numpy
+    parser.add_argument('--reduce-dim', type=int, default=None,
+                        help='Fit a dimensionality reduction stage with this target dimension (0 disables it)')
+    parser.add_argument('--reduction-method', choices=['pca', 'random'], default=None,
+                        help='Dimensionality reduction method')
+    parser.add_argument('--production', action='store_true',
+                        help='Serve with preloaded multi-worker gunicorn and a supervised UI')
+    parser.add_argument('--workers', type=int, default=None, help='Production workers (defaults to available cores)')
+    parser.add_argument('--app', choices=['api', 'flask'], default='api', help='Production server application')
+    parser.add_argument('--bind', default=None, help='Production server address, e.g. 0.0.0.0:8000')
+    parser.add_argument('--ui-backend', choices=['http', 'inprocess'], default=None,
+                        help="How the UI gets recommendations: through the API ('http') or a recommender "
+                             "loaded in the UI process ('inprocess')")
+    parser.add_argument('--import-profile', nargs='?', const='auto', choices=['auto', *MODE_MODULES],
+                        help='Report import times for the selected mode and exit')
     args = parser.parse_args()
     
+    if args.import_profile:
+        mode = args.import_profile
+        if mode == 'auto':
+            mode = 'ui' if args.ui_only else 'app' if args.app == 'flask' else 'api' if args.api_only else 'all'
+        import_profile(mode)
+        return
+    
+    if args.ui_backend:
+        # Inherited by the Streamlit process
+        os.environ['UI_BACKEND'] = args.ui_backend
+    
     # Initialize data
-    success = initialize_data(args.force_scrape)
+    success = initialize_data(args.force_scrape, args.reduce_dim, args.reduction_method)
     
     if not success:
         logging.error("Failed to initialize data. Exiting.")
         return
     
     # Start servers based on arguments
-    if args.api_only:
+    if args.production:
+        from launcher import serve
+        logging.info("Starting production serving stack")
+        serve(args.app, args.workers, args.bind, with_server=not args.ui_only, with_ui=not args.api_only)
+    elif args.api_only:
         logging.info("Starting API server only")
         start_fastapi()
     elif args.ui_only:
@@ -0,0 +1,262 @@
+import os
+import csv
+import time
+import queue
+import logging
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from database import AssessmentDatabase
+from embeddings import EmbeddingGenerator
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CSV_FIELDS = ['name', 'url', 'description', 'remote_testing', 'irt_support', 'duration', 'test_type']
+
+# Largest share of records without an embedding that may still replace the live catalog
+INGEST_MAX_MISSING_EMBEDDINGS = float(os.getenv("INGEST_MAX_MISSING_EMBEDDINGS", 0.05))
+
+# Marks the end of a stage's output
+_END = object()
+
+
+def read_records_from_csv(csv_path: str) -> Iterator[Dict[str, Any]]:
+    """Yield assessment records from a previously scraped CSV file."""
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            yield {field: row.get(field, '') for field in CSV_FIELDS}
+
+
+class StageStats:
+    """
+    Throughput counters for one pipeline stage.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.started = None
+        self.finished = None
+
+    def record(self, items: int, seconds: float):
+        self.items += items
+        self.busy_seconds += seconds
+
+    @property
+    def wall_seconds(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def summary(self) -> str:
+        rate = self.items / self.busy_seconds if self.busy_seconds > 0 else 0.0
+        return (f"{self.name:<8} {self.items:>7} items  busy {self.busy_seconds:8.2f}s  "
+                f"wall {self.wall_seconds:8.2f}s  {rate:10.1f} items/s")
+
+
+class IngestionPipeline:
+    """
+    Streams assessment records from a source through a batching embedder into a batched SQLite writer.
+    Each stage runs in its own thread, connected by bounded queues so a slow stage applies backpressure.
+    """
+    def __init__(self, database: Optional[AssessmentDatabase] = None,
+                 embedding_generator: Optional[EmbeddingGenerator] = None,
+                 embed_batch_size: int = 32, write_batch_size: int = 256, queue_size: int = 64,
+                 max_missing_embeddings: float = INGEST_MAX_MISSING_EMBEDDINGS):
+        self.database = database or AssessmentDatabase()
+        self.embedding_generator = embedding_generator
+        self.embed_batch_size = embed_batch_size
+        self.write_batch_size = write_batch_size
+        self.queue_size = queue_size
+        self.max_missing_embeddings = max_missing_embeddings
+        self.stats = {}
+        # Records of the last run that got no embedding (they are not served)
+        self.missing_embeddings = 0
+        self._failed = threading.Event()
+
+    def run(self, source: Iterable[Dict[str, Any]], csv_path: Optional[str] = None) -> bool:
+        """
+        Run the pipeline to completion.
+
+        Args:
+            source (Iterable[Dict]): Assessment records, e.g. SHLCatalogScraper.iter_catalog()
+            csv_path (str): If given, scraped records are also streamed to this CSV file
+
+        Returns:
+            bool: Success status
+        """
+        self._failed.clear()
+        self.missing_embeddings = 0
+        embed = self.embedding_generator is not None
+        self.stats = {name: StageStats(name) for name in (['scrape', 'embed', 'store'] if embed else ['scrape'])}
+
+        to_embed = queue.Queue(maxsize=self.queue_size) if embed else None
+        to_store = queue.Queue(maxsize=self.queue_size) if embed else None
+
+        if embed and not self.database.begin_ingest():
+            return False
+
+        threads = [threading.Thread(target=self._guard, args=('scrape', self._scrape_stage, source, csv_path, to_embed))]
+        if embed:
+            threads.append(threading.Thread(target=self._guard, args=('embed', self._embed_stage, to_embed, to_store)))
+            threads.append(threading.Thread(target=self._guard, args=('store', self._store_stage, to_store)))
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.print_report()
+
+        if self._failed.is_set():
+            logging.error("Ingestion pipeline failed; live catalog left unchanged")
+            return self._abort(embed)
+        if self.stats['scrape'].items == 0:
+            logging.error("Ingestion pipeline received no assessment records")
+            return self._abort(embed)
+        if not embed:
+            return True
+
+        # An embedding API outage must not publish a catalog that cannot be searched
+        total = self.stats['embed'].items
+        if self.missing_embeddings:
+            logging.warning(f"{self.missing_embeddings} of {total} assessments have no embedding "
+                            f"and will not be recommended")
+        if total and self.missing_embeddings / total > self.max_missing_embeddings:
+            logging.error(f"Too many assessments without embeddings ({self.missing_embeddings / total:.0%} > "
+                          f"{self.max_missing_embeddings:.0%}); live catalog left unchanged")
+            return self._abort(embed)
+        return self.database.commit_ingest()
+
+    def _abort(self, embed: bool) -> bool:
+        """Discard the staged rows of a failed run; always returns False."""
+        if embed:
+            self.database.abort_ingest()
+        return False
+
+    def print_report(self):
+        """Print per-stage throughput for the last run."""
+        print("Ingestion pipeline throughput:")
+        for stats in self.stats.values():
+            print(f"  {stats.summary()}")
+        if 'embed' in self.stats:
+            print(f"  {self.missing_embeddings} assessments without embeddings")
+
+    def _guard(self, name: str, stage, *args):
+        stats = self.stats[name]
+        stats.started = time.perf_counter()
+        try:
+            stage(stats, *args)
+        except Exception as e:
+            logging.error(f"Ingestion stage '{name}' failed: {e}")
+            self._failed.set()
+        finally:
+            stats.finished = time.perf_counter()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        """Blocking put that gives up if another stage has failed."""
+        while not self._failed.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        """Blocking get that gives up if another stage has failed."""
+        while not self._failed.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _scrape_stage(self, stats: StageStats, source: Iterable[Dict[str, Any]],
+                      csv_path: Optional[str], out: Optional[queue.Queue]):
+        writer = None
+        csv_file = None
+        tmp_path = f"{csv_path}.tmp" if csv_path else None
+        completed = False
+        try:
+            if csv_path:
+                csv_file = open(tmp_path, 'w', newline='', encoding='utf-8')
+                writer = csv.DictWriter(csv_file, fieldnames=CSV_FIELDS, extrasaction='ignore')
+                writer.writeheader()
+
+            iterator = iter(source)
+            while True:
+                start = time.perf_counter()
+                record = next(iterator, _END)
+                if record is _END:
+                    break
+                if writer:
+                    writer.writerow(record)
+                stats.record(1, time.perf_counter() - start)
+
+                if out is not None and not self._put(out, record):
+                    return
+            completed = True
+        finally:
+            if out is not None:
+                self._put(out, _END)
+            if csv_file:
+                csv_file.close()
+                # Only replace the existing CSV with a complete scrape
+                if completed and stats.items:
+                    os.replace(tmp_path, csv_path)
+                    logging.info(f"Saved assessment data to {csv_path}")
+                else:
+                    os.remove(tmp_path)
+
+    def _embed_stage(self, stats: StageStats, inp: queue.Queue, out: queue.Queue):
+        batch = []
+        done = False
+        while not done:
+            record = self._get(inp)
+            if record is _END:
+                done = True
+            else:
+                batch.append(record)
+            if batch and (done or len(batch) >= self.embed_batch_size):
+                start = time.perf_counter()
+                self._embed_batch(batch)
+                stats.record(len(batch), time.perf_counter() - start)
+                if not self._put(out, batch):
+                    return
+                batch = []
+        self._put(out, _END)
+
+    def _embed_batch(self, batch: List[Dict[str, Any]]):
+        """Set the whole-item 'embedding' and per-field 'segments' of each record."""
+        try:
+            self.embedding_generator.generate_record_embeddings(batch)
+        except Exception as e:
+            logging.error(f"Failed to embed batch of {len(batch)} assessments: {e}")
+            for record in batch:
+                record['embedding'] = None
+                record['segments'] = []
+        self.missing_embeddings += sum(1 for record in batch if record.get('embedding') is None)
+
+    def _store_stage(self, stats: StageStats, inp: queue.Queue):
+        pending = []
+        done = False
+        while not done:
+            batch = self._get(inp)
+            if batch is _END:
+                done = True
+            else:
+                pending.extend(batch)
+            if pending and (done or len(pending) >= self.write_batch_size):
+                start = time.perf_counter()
+                if not self.database.append_assessments(pending):
+                    raise RuntimeError("failed to write batch to staging table")
+                stats.record(len(pending), time.perf_counter() - start)
+                pending = []
+
+
+if __name__ == "__main__":
+    from scraper import SHLCatalogScraper
+
+    pipeline = IngestionPipeline(embedding_generator=EmbeddingGenerator())
+    pipeline.run(SHLCatalogScraper().iter_catalog(with_details=True), csv_path='assessments.csv')
@@ -1,13 +1,19 @@
 import os
+import hashlib
 import numpy as np
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Union
 import logging
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
-from sklearn.metrics.pairwise import cosine_similarity
 
-from database import AssessmentDatabase
+from catalog import CATALOG_WATCH_INTERVAL, CatalogManager, CatalogVersion
+from database import AssessmentDatabase, DEFAULT_SNAPSHOT_PATH, snapshot_version
 from embeddings import EmbeddingGenerator
+from reduction import normalize_rows
+from resilience import CircuitBreaker, CircuitOpen, with_fault_injection
+from role_templates import TEMPLATE_TOP_N, TemplateStore
 
 # Load environment variables from .env file
 load_dotenv()
@@ -15,6 +21,28 @@ load_dotenv()
 # Get the Google API key
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
+# Columnar catalog snapshot preferred over the database at startup
+SNAPSHOT_PATH = DEFAULT_SNAPSHOT_PATH
+
+# Candidates considered by diversity re-ranking, as a multiple of the requested results
+MMR_CANDIDATE_FACTOR = int(os.getenv("MMR_CANDIDATE_FACTOR", 5))
+MMR_MIN_CANDIDATES = 50
+
+# How scores of a chunked query are combined per assessment: 'max' or 'mean'
+QUERY_POOLING = os.getenv("QUERY_POOLING", "max")
+POOLING_METHODS = ("max", "mean")
+
+# Serving-path embedding calls are not retried; this bounds how long one may take
+QUERY_EMBED_TIMEOUT = float(os.getenv("QUERY_EMBED_TIMEOUT", 3.0))
+# Recent query embeddings kept per worker; repeated queries skip the API, even while it is down
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 1024))
+
+# How a result set was ranked: query embeddings, the precomputed results of a matching role
+# template, or the BM25 fallback while embeddings are unavailable
+SEMANTIC = "semantic"
+TEMPLATE = "template"
+LEXICAL = "lexical"
+
 if not GOOGLE_API_KEY:
     logging.warning("No Google API key found. Please set GOOGLE_API_KEY in the .env file")
 
@@ -22,53 +50,278 @@ if not GOOGLE_API_KEY:
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    k = min(k, len(scores))
+    top_indices = np.argpartition(-scores, k - 1)[:k]
+    return top_indices[np.argsort(-scores[top_indices])]
+
+
+def mmr_rerank(vectors: np.ndarray, relevance: np.ndarray, k: int, diversity_lambda: float) -> np.ndarray:
+    """
+    Maximal Marginal Relevance selection over a candidate set.
+    Each step picks the candidate maximizing
+    lambda * relevance - (1 - lambda) * (max similarity to the already selected items),
+    updating the max similarities with one matrix-vector product, so the cost is O(k * candidates * dim).
+
+    Args:
+        vectors (np.ndarray): L2-normalized candidate vectors (candidates x dim)
+        relevance (np.ndarray): Query similarity of each candidate
+        k (int): Number of items to select
+        diversity_lambda (float): 1.0 ranks purely by relevance, lower values favour diversity
+
+    Returns:
+        np.ndarray: Selected candidate positions, in selection order
+    """
+    k = min(k, len(relevance))
+    selected = np.empty(k, dtype=np.intp)
+    max_similarity = np.full(len(relevance), -np.inf, dtype=np.float32)
+    weighted_relevance = diversity_lambda * relevance
+
+    best = int(np.argmax(relevance))
+    for i in range(k):
+        selected[i] = best
+        np.maximum(max_similarity, vectors @ vectors[best], out=max_similarity)
+        mmr = weighted_relevance - (1.0 - diversity_lambda) * max_similarity
+        mmr[selected[:i + 1]] = -np.inf
+        best = int(np.argmax(mmr))
+    return selected
+
+
+def score_catalog(index: np.ndarray, query_vectors: np.ndarray, pooling: Optional[str] = None,
+                  segments: Optional[np.ndarray] = None, offsets: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Cosine similarity of every assessment to a normalized query vector, or to a matrix of
+    query chunk vectors pooled per assessment ('max': best matching chunk, 'mean': average).
+    With a multi-vector catalog, an assessment scores as its best matching vector: the products
+    run over the flattened `segments` matrix and are reduced per assessment with a segment-max
+    over `offsets`, so the cost stays linear in the total number of vectors.
+    """
+    matrix = index if segments is None else segments
+    if query_vectors.ndim == 1:
+        # Cosine similarity against every vector in one matrix-vector product
+        scores = matrix @ query_vectors
+        return scores if segments is None else np.maximum.reduceat(scores, offsets)
+
+    pooling = pooling or QUERY_POOLING
+    if pooling not in POOLING_METHODS:
+        raise ValueError(f"Unknown pooling method '{pooling}'; expected one of {POOLING_METHODS}")
+    # One matrix-matrix product for all chunks (vectors x chunks)
+    chunk_scores = matrix @ query_vectors.T
+    if segments is not None:
+        chunk_scores = np.maximum.reduceat(chunk_scores, offsets, axis=0)
+    return chunk_scores.max(axis=1) if pooling == "max" else chunk_scores.mean(axis=1)
+
+
+def select_results(index: np.ndarray, scores: np.ndarray, top_n: int,
+                   diversity_lambda: Optional[float] = None) -> np.ndarray:
+    """
+    Pick the catalog rows to return from per-assessment scores, in result order.
+    Diversity re-ranking compares assessments by their whole-item `index` vectors.
+    """
+    if diversity_lambda is None or diversity_lambda >= 1.0:
+        return top_k(scores, top_n)
+
+    candidates = top_k(scores, max(top_n * MMR_CANDIDATE_FACTOR, MMR_MIN_CANDIDATES))
+    selected = mmr_rerank(np.asarray(index[candidates]), scores[candidates], top_n, diversity_lambda)
+    return candidates[selected]
+
+
+def rank_catalog(index: np.ndarray, query_vectors: np.ndarray, top_n: int,
+                 diversity_lambda: Optional[float] = None, pooling: Optional[str] = None,
+                 segments: Optional[np.ndarray] = None, offsets: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score a normalized query (a vector, or one row per query chunk) against the catalog and pick the results.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Selected catalog rows in result order, and the scores of all rows
+    """
+    scores = score_catalog(index, query_vectors, pooling, segments, offsets)
+    return select_results(index, scores, top_n, diversity_lambda), scores
+
+
 class AssessmentRecommender:
-    def __init__(self):
-        self.database = AssessmentDatabase()
-        self.embedding_generator = EmbeddingGenerator(api_key=GOOGLE_API_KEY)
-        self.assessments_df = None
+    def __init__(self, database: AssessmentDatabase = None, embedding_generator: Optional[EmbeddingGenerator] = None,
+                 snapshot_path: Optional[str] = None, watch: bool = True, query_cache_size: int = QUERY_CACHE_SIZE,
+                 breaker: Union[CircuitBreaker, bool] = True, templates: Union[TemplateStore, bool] = True,
+                 embed_timeout: float = QUERY_EMBED_TIMEOUT):
+        """
+        Args:
+            database (AssessmentDatabase): Catalog storage (defaults to DATABASE_URL)
+            embedding_generator (EmbeddingGenerator): Query embeddings (defaults to the Gemini client)
+            snapshot_path (str): Snapshot root directory preferred over the database
+            watch (bool): Poll the snapshot for newly published versions (False for a catalog that never changes)
+            query_cache_size (int): Recent query embeddings kept (0 disables the cache)
+            breaker (CircuitBreaker or bool): Breaker around query embedding calls; while it is open, queries
+                are ranked lexically. True uses the default breaker; False calls the generator directly
+                and lets its errors propagate
+            templates (TemplateStore or bool): Precomputed role template results; True uses the default
+                table directory, False disables them
+            embed_timeout (float): Seconds one query embedding call may take
+        """
+        self.database = database or AssessmentDatabase()
+        self.embedding_generator = embedding_generator or with_fault_injection(EmbeddingGenerator(api_key=GOOGLE_API_KEY))
+        if breaker is True:
+            breaker = CircuitBreaker("embeddings")
+        self.breaker: Optional[CircuitBreaker] = breaker or None
+        self.embed_timeout = embed_timeout
+        self.query_cache_size = query_cache_size
+        self._query_cache = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        if templates is True:
+            templates = TemplateStore()
+        self.templates: Optional[TemplateStore] = templates or None
+        self.snapshot_path = snapshot_path or SNAPSHOT_PATH
+        # Snapshot version last passed over because the database had moved on since its export
+        self._stale_snapshot: Optional[str] = None
+        # Versioned catalog; new snapshots are swapped in without interrupting requests
+        self.catalog = CatalogManager(self._build_catalog, version_probe=self._published_version,
+                                      watch_interval=CATALOG_WATCH_INTERVAL if watch else 0)
 
         # Load assessments data
         self._load_assessments()
 
+    @property
+    def assessments_df(self) -> Optional[pd.DataFrame]:
+        active = self.catalog.active
+        return active.metadata if active is not None else None
+
+    @property
+    def embedding_matrix(self) -> Optional[np.ndarray]:
+        active = self.catalog.active
+        return active.index if active is not None else None
+
+    @property
+    def reducer(self):
+        active = self.catalog.active
+        return active.reducer if active is not None else None
+
+    @property
+    def catalog_version(self) -> Optional[str]:
+        return self.catalog.version
+
     def _load_assessments(self):
-        """Load assessment data from the database."""
-        self.assessments_df = self.database.load_assessments()
-        if self.assessments_df.empty:
+        """Load the catalog and make it the active version."""
+        if not self.catalog.reload():
             logging.warning("No assessment data loaded. Recommendations will not be available.")
-        else:
-            self.assessments_df = self.assessments_df[self.assessments_df['embedding'].notna()]
-            logging.info(f"Loaded {len(self.assessments_df)} assessments with embeddings")
 
-    def recommend(self, query: str, top_n: int = 10) -> List[Dict[str, Any]]:
-        """Generate recommendations based on a query."""
-        if self.assessments_df is None or self.assessments_df.empty:
-            logging.error("No assessment data available for recommendations")
-            return []
+    def _published_version(self) -> Optional[str]:
+        """
+        The snapshot version the watcher should load, or None while CURRENT still names the
+        snapshot rejected as stale (the database-built version serving instead never matches it).
+        """
+        version = snapshot_version(self.snapshot_path)
+        return None if version == self._stale_snapshot else version
+
+    def _build_catalog(self) -> Optional[CatalogVersion]:
+        """Build a catalog version from the current snapshot if it is up to date, otherwise from the database."""
+        snapshot = self.database.load_snapshot(self.snapshot_path)
+        if snapshot is not None and not self.database.snapshot_is_current(snapshot):
+            logging.warning(f"Snapshot version {snapshot['version']} is older than the catalog in the database; "
+                            f"loading from the database")
+            self._stale_snapshot = snapshot['version']
+            snapshot = None
+        if snapshot is not None:
+            self._stale_snapshot = None
+            # The snapshot matrices are already reduced and normalized; use the memory-mapped arrays as is
+            return CatalogVersion(snapshot['version'], snapshot['metadata'], snapshot['index'],
+                                  snapshot['reducer'], source="snapshot",
+                                  segments=snapshot['segments'], offsets=snapshot['offsets'])
+
+        assessments_df = self.database.load_assessments()
+        if assessments_df.empty:
+            return None
+
+        assessments_df = assessments_df[assessments_df['embedding'].notna()].reset_index(drop=True)
+        logging.info(f"Loaded {len(assessments_df)} assessments with embeddings")
+        if assessments_df.empty:
+            return None
 
-        # Generate embedding for the query
-        query_embedding = self.embedding_generator.generate_embedding_for_query(query)
+        built = self.database.build_index(assessments_df)
+        if built['reducer'] is not None:
+            logging.info(f"Scoring in {built['reducer'].n_components}-dimensional {built['reducer'].method} space")
+
+        digest = hashlib.sha1(built['index'].tobytes())
+        if built['segments'] is not None:
+            digest.update(built['segments'].tobytes())
+        return CatalogVersion("db-" + digest.hexdigest()[:8], assessments_df, built['index'], built['reducer'],
+                              segments=built['segments'], offsets=built['offsets'])
+
+    def recommend(self, query: str, top_n: int = 10, diversity_lambda: Optional[float] = None,
+                  pooling: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Generate recommendations based on a query.
+        Long queries are scored chunk by chunk and combined with `pooling` ('max' or 'mean', defaulting to QUERY_POOLING).
+        If diversity_lambda is given, results are re-ranked with MMR to avoid near-duplicate assessments.
+        """
+        recommendations, _, _ = self.recommend_with_mode(query, top_n, diversity_lambda, pooling)
+        return recommendations
 
-        if query_embedding is None:
-            logging.error("Failed to generate embedding for the query")
-            return []
+    def recommend_with_version(self, query: str, top_n: int = 10, diversity_lambda: Optional[float] = None,
+                               pooling: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Generate recommendations and return them with the catalog version that produced them."""
+        recommendations, version, _ = self.recommend_with_mode(query, top_n, diversity_lambda, pooling)
+        return recommendations, version
 
-        # Calculate similarity scores
-        similarities = []
-        for idx, row in self.assessments_df.iterrows():
-            if row['embedding'] is not None:
-                similarity = self._calculate_similarity(query_embedding, row['embedding'])
-                similarities.append((idx, similarity))
+    def recommend_with_mode(self, query: str, top_n: int = 10, diversity_lambda: Optional[float] = None,
+                            pooling: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[str]]:
+        """
+        Generate recommendations and return them with the catalog version that produced them and
+        how they were ranked: SEMANTIC, TEMPLATE when a precomputed role template matched the query,
+        or LEXICAL when no query embedding could be obtained.
+        """
+        with self.catalog.acquire() as catalog:
+            if catalog is None:
+                logging.error("No assessment data available for recommendations")
+                return [], None, None
 
-        # Sort by similarity
-        similarities.sort(key=lambda x: x[1], reverse=True)
+            # Precomputed rankings are by relevance only, and TEMPLATE_TOP_N deep
+            table = None
+            if (self.templates is not None and top_n <= TEMPLATE_TOP_N
+                    and (diversity_lambda is None or diversity_lambda >= 1.0)):
+                table = self.templates.get(catalog.version)
+            if table is not None:
+                # Same words as a template: answer without calling the embedding API
+                template = table.match_text(query)
+                if template is not None:
+                    rows, scores = table.results(template, top_n)
+                    return self._format_results(catalog, rows, scores), catalog.version, TEMPLATE
 
-        top_indices = [idx for idx, _ in similarities[:top_n]]
-        top_scores = [score for _, score in similarities[:top_n]]
+            # One embedding per query chunk (a single chunk for short queries)
+            query_embeddings = self._query_embeddings(query)
 
+            if query_embeddings:
+                query_vectors = np.asarray(query_embeddings, dtype=np.float32)
+                if len(query_vectors) == 1:
+                    query_vectors = query_vectors[0]
+                if catalog.reducer is not None:
+                    query_vectors = catalog.reducer.transform(query_vectors)
+                query_vectors = normalize_rows(query_vectors)
+
+                template = table.match_vector(query_vectors) if table is not None and query_vectors.ndim == 1 else None
+                if template is not None:
+                    rows, scores = table.results(template, top_n)
+                    return self._format_results(catalog, rows, scores), catalog.version, TEMPLATE
+
+                scores = score_catalog(catalog.index, query_vectors, pooling, catalog.segments, catalog.offsets)
+                mode = SEMANTIC
+            else:
+                logging.info("No query embedding available; ranking lexically")
+                scores = catalog.lexical.score(query)
+                mode = LEXICAL
+
+            top_indices = select_results(catalog.index, scores, top_n, diversity_lambda)
+            if mode == LEXICAL:
+                # Assessments sharing no term with the query are not matches
+                top_indices = top_indices[scores[top_indices] > 0]
+
+            return self._format_results(catalog, top_indices, scores[top_indices]), catalog.version, mode
+
+    def _format_results(self, catalog: CatalogVersion, rows: np.ndarray, scores: np.ndarray) -> List[Dict[str, Any]]:
+        """Recommendation dicts for catalog rows, best first, with their scores."""
         recommendations = []
-        for i, idx in enumerate(top_indices):
-            row = self.assessments_df.iloc[idx]
+        for idx, score in zip(rows, scores):
+            row = catalog.metadata.iloc[idx]
             recommendations.append({
                 'name': row['name'],
                 'url': row['url'],
@@ -77,20 +330,77 @@ class AssessmentRecommender:
                 'irt_support': row['irt_support'],
                 'duration': row['duration'],
                 'test_type': row['test_type'],
-                'similarity_score': float(top_scores[i])
+                'similarity_score': float(score)
             })
-
         return recommendations
 
+    def _query_embeddings(self, query: str) -> List[List[float]]:
+        """
+        Query chunk embeddings from the cache or the embedding API (through the circuit breaker).
+        Returns an empty list when the API fails, is too slow or its circuit is open.
+        """
+        key = query.strip()
+        with self._query_cache_lock:
+            cached = self._query_cache.get(key)
+            if cached is not None:
+                self._query_cache.move_to_end(key)
+                return cached
+
+        if self.breaker is None:
+            embeddings = self.embedding_generator.embed_query_chunks(query, timeout=self.embed_timeout)
+        else:
+            try:
+                embeddings = self.breaker.call(self.embedding_generator.embed_query_chunks, query,
+                                               timeout=self.embed_timeout)
+            except CircuitOpen:
+                return []
+            except Exception as e:
+                logging.warning(f"Error generating query embedding: {e}")
+                return []
+
+        if embeddings and self.query_cache_size > 0:
+            with self._query_cache_lock:
+                self._query_cache[key] = embeddings
+                while len(self._query_cache) > self.query_cache_size:
+                    self._query_cache.popitem(last=False)
+        return embeddings
+
     def _calculate_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
         """Calculate cosine similarity between two embeddings."""
-        vec1 = np.array(embedding1).reshape(1, -1)
-        vec2 = np.array(embedding2).reshape(1, -1)
-        return cosine_similarity(vec1, vec2)[0][0]
+        vec1 = normalize_rows(np.asarray(embedding1, dtype=np.float32))
+        vec2 = normalize_rows(np.asarray(embedding2, dtype=np.float32))
+        return float(vec1 @ vec2)
 
-    def refresh_data(self):
-        """Reload assessment data from the database."""
-        self._load_assessments()
+    def refresh_data(self) -> bool:
+        """Reload the catalog and swap it in once validated; the current version is kept on failure."""
+        return self.catalog.reload()
+
+    def refresh_data_async(self):
+        """Reload the catalog in the background while the current version keeps serving."""
+        return self.catalog.reload_async()
+
+
+_shared_recommender = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_recommender() -> AssessmentRecommender:
+    """
+    Return the process-wide recommender used by both web apps.
+    The catalog is loaded once instead of on every request.
+    """
+    global _shared_recommender
+    if _shared_recommender is None:
+        with _shared_lock:
+            if _shared_recommender is None:
+                _shared_recommender = AssessmentRecommender()
+    return _shared_recommender
+
+
+def shared_catalog_version() -> Optional[str]:
+    """Catalog version of the process-wide recommender, or None if it has not been loaded yet (never loads it)."""
+    recommender = _shared_recommender
+    return recommender.catalog_version if recommender is not None else None
 
 
 if __name__ == "__main__":
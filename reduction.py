@@ -0,0 +1,191 @@
+import os
+import logging
+import numpy as np
+from typing import Dict, Any, Optional
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Target dimension for the optional reduction stage (0 disables it)
+DEFAULT_REDUCED_DIM = int(os.getenv("EMBEDDING_REDUCED_DIM", "0"))
+DEFAULT_REDUCTION_METHOD = os.getenv("EMBEDDING_REDUCTION_METHOD", "pca")
+
+SUPPORTED_METHODS = ("pca", "random")
+
+
+class EmbeddingReducer:
+    """
+    Projects embeddings into a lower-dimensional space.
+    Fitted once on the catalog during ingestion and applied to query embeddings at request time.
+    Supports PCA (via SVD) and Gaussian random projection.
+    """
+    def __init__(self, n_components: int, method: str = "pca", seed: int = 42):
+        if method not in SUPPORTED_METHODS:
+            raise ValueError(f"Unsupported reduction method: {method}")
+        self.n_components = n_components
+        # Dimension asked for; n_components may end up lower (PCA is bounded by the catalog rank)
+        self.target_dim = n_components
+        self.method = method
+        self.seed = seed
+        self.mean = None
+        self.components = None
+        self.explained_variance_ratio = None
+
+    @property
+    def input_dim(self) -> Optional[int]:
+        return None if self.components is None else self.components.shape[0]
+
+    def fit(self, matrix: np.ndarray) -> "EmbeddingReducer":
+        """
+        Fit the projection on a catalog embedding matrix.
+
+        Args:
+            matrix (np.ndarray): Array of shape (n_items, dim)
+
+        Returns:
+            EmbeddingReducer: The fitted reducer
+        """
+        matrix = np.asarray(matrix, dtype=np.float32)
+        n_items, dim = matrix.shape
+
+        if self.method == "pca":
+            # The rank of the centred catalog bounds the useful number of components
+            n_components = min(self.n_components, n_items, dim)
+            self.mean = matrix.mean(axis=0)
+            _, singular_values, vt = np.linalg.svd(matrix - self.mean, full_matrices=False)
+            self.components = vt[:n_components].T.astype(np.float32)
+
+            variance = singular_values ** 2
+            total = variance.sum()
+            self.explained_variance_ratio = float(variance[:n_components].sum() / total) if total > 0 else 1.0
+        else:
+            n_components = min(self.n_components, dim)
+            rng = np.random.default_rng(self.seed)
+            self.mean = np.zeros(dim, dtype=np.float32)
+            self.components = (rng.standard_normal((dim, n_components)) / np.sqrt(n_components)).astype(np.float32)
+
+        self.n_components = n_components
+        logging.info(f"Fitted {self.method} reducer: {dim} -> {n_components} dimensions")
+        return self
+
+    def transform(self, matrix: np.ndarray) -> np.ndarray:
+        """Project a (n, dim) matrix or a single (dim,) vector into the reduced space."""
+        if self.components is None:
+            raise RuntimeError("Reducer has not been fitted")
+        matrix = np.asarray(matrix, dtype=np.float32)
+        return (matrix - self.mean) @ self.components
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the fitted reducer state."""
+        return {
+            'method': self.method,
+            'n_components': self.n_components,
+            'target_dim': self.target_dim,
+            'seed': self.seed,
+            'mean': self.mean,
+            'components': self.components,
+            'explained_variance_ratio': self.explained_variance_ratio,
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "EmbeddingReducer":
+        """Rebuild a fitted reducer from its serialized state."""
+        reducer = cls(state['n_components'], state['method'], state.get('seed', 42))
+        reducer.target_dim = state.get('target_dim', state['n_components'])
+        reducer.mean = np.asarray(state['mean'], dtype=np.float32)
+        reducer.components = np.asarray(state['components'], dtype=np.float32)
+        reducer.explained_variance_ratio = state.get('explained_variance_ratio')
+        return reducer
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize the rows of a matrix so that dot products are cosine similarities."""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def evaluate_ranking_agreement(matrix: np.ndarray, reducer: EmbeddingReducer,
+                               queries: np.ndarray, k: int = 10) -> Dict[str, float]:
+    """
+    Compare top-k rankings in the reduced space against full-dimension cosine rankings.
+
+    Args:
+        matrix (np.ndarray): Full-dimension catalog embeddings
+        reducer (EmbeddingReducer): Fitted reducer
+        queries (np.ndarray): Full-dimension query embeddings, not rows of `matrix` (a catalog row
+            is always its own top-1 match, which inflates the agreement)
+        k (int): Ranking depth to compare
+
+    Returns:
+        Dict: Mean overlap@k, top-1 agreement and the scoring cost reduction
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    k = min(k, len(matrix))
+
+    full_scores = normalize_rows(queries) @ normalize_rows(matrix).T
+    reduced_scores = normalize_rows(reducer.transform(queries)) @ normalize_rows(reducer.transform(matrix)).T
+
+    full_top = np.argsort(-full_scores, axis=1)[:, :k]
+    reduced_top = np.argsort(-reduced_scores, axis=1)[:, :k]
+
+    overlaps = [len(np.intersect1d(f, r)) / k for f, r in zip(full_top, reduced_top)]
+    top1 = np.mean(full_top[:, 0] == reduced_top[:, 0])
+
+    return {
+        'k': k,
+        'queries': len(queries),
+        'overlap_at_k': float(np.mean(overlaps)),
+        'top1_agreement': float(top1),
+        'full_dim': matrix.shape[1],
+        'reduced_dim': reducer.n_components,
+        'flops_ratio': matrix.shape[1] / reducer.n_components,
+    }
+
+
+def holdout_ranking_agreement(matrix: np.ndarray, n_components: int, method: str = "pca",
+                              k: int = 10, holdout: float = 0.2, seed: int = 0) -> Dict[str, float]:
+    """
+    Ranking agreement without query logs: a random `holdout` share of the catalog is kept out of
+    both the reducer fit and the searched catalog, and used as probe queries against the rest.
+
+    Args:
+        matrix (np.ndarray): Full-dimension catalog embeddings
+        n_components (int): Target dimension
+        method (str): Reduction method ('pca' or 'random')
+        k (int): Ranking depth to compare
+        holdout (float): Share of the catalog used as probes
+        seed (int): Seed of the split
+
+    Returns:
+        Dict: The evaluate_ranking_agreement() report, measured on the held-out probes
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    order = np.random.default_rng(seed).permutation(len(matrix))
+    n_probes = min(max(1, int(len(matrix) * holdout)), len(matrix) - 1)
+    probes, catalog = matrix[order[:n_probes]], matrix[order[n_probes:]]
+    reducer = EmbeddingReducer(n_components, method).fit(catalog)
+    return evaluate_ranking_agreement(catalog, reducer, probes, k)
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import AssessmentDatabase
+
+    parser = argparse.ArgumentParser(description='Evaluate embedding dimensionality reduction on the stored catalog')
+    parser.add_argument('--dim', type=int, default=DEFAULT_REDUCED_DIM or 128, help='Target dimension')
+    parser.add_argument('--method', choices=SUPPORTED_METHODS, default=DEFAULT_REDUCTION_METHOD, help='Reduction method')
+    parser.add_argument('--k', type=int, default=10, help='Ranking depth to compare')
+    parser.add_argument('--holdout', type=float, default=0.2, help='Share of the catalog held out as probe queries')
+    args = parser.parse_args()
+
+    df = AssessmentDatabase().load_assessments()
+    df = df[df['embedding'].notna()] if not df.empty else df
+    if df.empty:
+        print("No embeddings stored in the database")
+    else:
+        catalog = np.vstack(df['embedding'].to_numpy()).astype(np.float32)
+        report = holdout_ranking_agreement(catalog, args.dim, args.method, args.k, args.holdout)
+        print(f"Ranking agreement ({args.method}, {report['full_dim']} -> {report['reduced_dim']}):")
+        for key, value in report.items():
+            print(f"  {key}: {value}")
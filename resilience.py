@@ -0,0 +1,385 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, List, Optional
+
+from embeddings import EmbeddingGenerator
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Per-worker admission control: requests served at once, and requests allowed to wait for a slot
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", 8))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", 16))
+# Seconds a queued request waits for a slot before it is shed
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 1.0))
+
+# Circuit breaker around the embedding API: trips when, over the last BREAKER_WINDOW calls
+# (and at least BREAKER_MIN_CALLS), the error rate or the rate of calls slower than
+# BREAKER_SLOW_CALL_SECONDS reaches its threshold; stays open for BREAKER_OPEN_SECONDS
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", 0.5))
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", 2.0))
+BREAKER_SLOW_RATE = float(os.getenv("BREAKER_SLOW_RATE", 0.5))
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", 20))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", 5))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", 30))
+
+# Optional fault injection for the live embedding client, e.g. "error_rate=0.3,latency=2.5,jitter=0.5"
+EMBEDDING_FAULT_INJECTION = os.getenv("EMBEDDING_FAULT_INJECTION", "")
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed because the worker is at capacity."""
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+
+class AdmissionController:
+    """
+    Bounds the requests a worker serves concurrently. Up to `max_queue` further requests
+    wait (at most `queue_timeout` seconds) for a slot; beyond that requests are rejected
+    immediately, so an overloaded worker answers with a fast 503 instead of a slow timeout.
+    Freed slots are handed to waiting requests in arrival order, so new arrivals cannot
+    overtake them.
+    """
+    def __init__(self, max_concurrent: int = ADMISSION_MAX_CONCURRENT, max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.rejected = 0
+        self._queue = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._queue)
+
+    @contextmanager
+    def admit(self):
+        """Hold a slot for the duration of a request; raises Overloaded if none is available in time."""
+        ticket = None
+        with self._lock:
+            if self.active < self.max_concurrent and not self._queue:
+                self.active += 1
+            elif len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded("Too many requests queued")
+            else:
+                ticket = threading.Event()
+                self._queue.append(ticket)
+
+        if ticket is not None and not ticket.wait(self.queue_timeout):
+            with self._lock:
+                # The slot may have been handed over just as the wait timed out
+                if not ticket.is_set():
+                    self._queue.remove(ticket)
+                    self.rejected += 1
+                    raise Overloaded("Timed out waiting for a free slot")
+        try:
+            yield
+        finally:
+            with self._lock:
+                if self._queue:
+                    # Pass the slot straight to the oldest waiting request
+                    self._queue.popleft().set()
+                else:
+                    self.active -= 1
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker over a sliding window of recent calls.
+    While open, calls fail fast with CircuitOpen so callers can serve a fallback. After
+    `open_seconds` a single trial call is let through (half-open): success closes the
+    circuit, a failure or slow call opens it again.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name: str, failure_rate: float = BREAKER_FAILURE_RATE,
+                 slow_call_seconds: float = BREAKER_SLOW_CALL_SECONDS, slow_rate: float = BREAKER_SLOW_RATE,
+                 window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 open_seconds: float = BREAKER_OPEN_SECONDS):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self._calls = deque(maxlen=window)  # (failed, slow) per call
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call fn through the breaker; raises CircuitOpen without calling it while open."""
+        trial = self._before_call()
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._record(trial, failed=True, slow=False)
+            raise
+        self._record(trial, failed=False, slow=time.perf_counter() - start >= self.slow_call_seconds)
+        return result
+
+    def _before_call(self) -> bool:
+        """Check whether a call may proceed; returns True for the half-open trial call."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = self.HALF_OPEN
+                logging.info(f"Circuit '{self.name}' half-open; sending a trial call")
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            raise CircuitOpen(f"Circuit '{self.name}' is open")
+
+    def _record(self, trial: bool, failed: bool, slow: bool):
+        with self._lock:
+            if trial:
+                self._trial_running = False
+                if failed or slow:
+                    self._open("trial call failed" if failed else "trial call was slow")
+                else:
+                    self.state = self.CLOSED
+                    self._calls.clear()
+                    logging.info(f"Circuit '{self.name}' closed")
+                return
+            if self.state != self.CLOSED:
+                # A call that started before the circuit opened
+                return
+
+            self._calls.append((failed, slow))
+            if len(self._calls) < self.min_calls:
+                return
+            failures = sum(f for f, _ in self._calls) / len(self._calls)
+            slow_calls = sum(s for _, s in self._calls) / len(self._calls)
+            if failures >= self.failure_rate:
+                self._open(f"error rate {failures:.0%}")
+            elif slow_calls >= self.slow_rate:
+                self._open(f"slow call rate {slow_calls:.0%}")
+
+    def _open(self, reason: str):
+        """Open the circuit (caller holds _lock)."""
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        logging.warning(f"Circuit '{self.name}' opened for {self.open_seconds:.0f}s: {reason}")
+
+
+class FaultInjectingEmbeddingGenerator(EmbeddingGenerator):
+    """
+    Wraps an embedding generator and injects upstream faults: added latency (honouring the
+    call timeout, like the real client) and random errors. Used to exercise the circuit
+    breaker and fallback locally; the fault settings can be changed while it is in use.
+    """
+    def __init__(self, inner: EmbeddingGenerator, error_rate: float = 0.0, latency: float = 0.0,
+                 jitter: float = 0.0, seed: Optional[int] = None):
+        if inner.client is None:
+            raise ValueError("Cannot inject faults into an embedding generator without a client")
+        super().__init__(api_key=inner.api_key, client=inner.client)
+        self.inner = inner
+        self.error_rate = error_rate
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+
+    def generate_embedding(self, text: str) -> Optional[List[float]]:
+        return self._embed_call([text])[0]
+
+    def _embed_call(self, texts: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if timeout and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Injected fault: embedding call timed out after {timeout}s")
+        time.sleep(delay)
+        if self._random.random() < self.error_rate:
+            raise ConnectionError("Injected fault: embedding call failed")
+        return self.inner._embed_call(texts, timeout)
+
+
+def with_fault_injection(generator: EmbeddingGenerator, spec: str = EMBEDDING_FAULT_INJECTION) -> EmbeddingGenerator:
+    """Wrap `generator` according to a "error_rate=..,latency=..,jitter=.." spec (unchanged if empty)."""
+    if not spec:
+        return generator
+    if generator.client is None:
+        logging.warning("Embedding fault injection ignored: no embedding client")
+        return generator
+    settings = {}
+    for item in spec.split(','):
+        key, _, value = item.partition('=')
+        if key.strip() not in ('error_rate', 'latency', 'jitter'):
+            raise ValueError(f"Unknown fault injection setting '{key.strip()}'")
+        settings[key.strip()] = float(value)
+    logging.warning(f"Injecting embedding faults: {settings}")
+    return FaultInjectingEmbeddingGenerator(generator, **settings)
+
+
+_admission_controller = None
+_admission_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Return the process-wide admission controller shared by the web apps."""
+    global _admission_controller
+    if _admission_controller is None:
+        with _admission_lock:
+            if _admission_controller is None:
+                _admission_controller = AdmissionController()
+    return _admission_controller
+
+
+if __name__ == "__main__":
+    # Self-check of the admission and circuit breaker state machines against a local
+    # fault-injecting stub; every step asserts, so a regression fails loudly
+    from evaluation import StubEmbeddingGenerator
+
+    def start(target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        return thread
+
+    # Admission: freed slots go to waiting requests in arrival order, arrivals beyond the queue are shed
+    admission = AdmissionController(max_concurrent=1, max_queue=2, queue_timeout=2.0)
+    order = []
+    release = threading.Event()
+
+    def hold(name):
+        with admission.admit():
+            order.append(name)
+            release.wait()
+
+    holder = start(hold, 'holder')
+    while admission.active < 1:
+        time.sleep(0.001)
+    waiters = []
+    for name in ('first', 'second'):
+        waiters.append(start(hold, name))
+        while admission.waiting < len(waiters):
+            time.sleep(0.001)
+    try:
+        with admission.admit():
+            raise AssertionError("a request beyond the queue was admitted")
+    except Overloaded:
+        pass
+    assert admission.rejected == 1
+    release.set()
+    for thread in [holder] + waiters:
+        thread.join(2.0)
+    assert order == ['holder', 'first', 'second'], order
+    assert admission.active == 0 and admission.waiting == 0
+
+    # Admission: a waiter that times out is removed and does not leak a slot
+    admission = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=0.05)
+    admission.active = 1  # a request holding the only slot
+    try:
+        with admission.admit():
+            raise AssertionError("admitted without a free slot")
+    except Overloaded:
+        pass
+    assert admission.waiting == 0 and admission.active == 1 and admission.rejected == 1
+
+    # Admission: a slot handed over just as the wait times out is kept, not shed and not leaked
+    admitted = []
+
+    def wait_for_slot():
+        with admission.admit():
+            admitted.append(True)
+
+    waiter = start(wait_for_slot)
+    while admission.waiting < 1:
+        time.sleep(0.001)
+    with admission._lock:
+        time.sleep(0.1)  # the waiter's timeout expires while the slot is being released
+        admission._queue.popleft().set()
+    waiter.join(2.0)
+    assert admitted == [True] and admission.rejected == 1 and admission.active == 0
+
+    # Breaker: trips on the error rate and then fails fast without calling the dependency
+    def fail():
+        raise ConnectionError("down")
+
+    calls = []
+    breaker = CircuitBreaker("check", failure_rate=0.5, slow_call_seconds=1.0, window=4, min_calls=4, open_seconds=0.1)
+    for fn in (lambda: None, lambda: None, fail, fail):
+        try:
+            breaker.call(fn)
+        except ConnectionError:
+            pass
+    assert breaker.state == CircuitBreaker.OPEN
+    try:
+        breaker.call(calls.append, 'called')
+        raise AssertionError("an open circuit let a call through")
+    except CircuitOpen:
+        pass
+    assert calls == []
+
+    # Breaker: half-open lets exactly one trial through; its success closes the circuit
+    time.sleep(0.15)
+    trial_started, finish_trial = threading.Event(), threading.Event()
+
+    def trial():
+        trial_started.set()
+        finish_trial.wait(2.0)
+
+    trial_thread = start(breaker.call, trial)
+    trial_started.wait(2.0)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    try:
+        breaker.call(calls.append, 'called')
+        raise AssertionError("a second call got through while half-open")
+    except CircuitOpen:
+        pass
+    finish_trial.set()
+    trial_thread.join(2.0)
+    assert breaker.state == CircuitBreaker.CLOSED and calls == []
+
+    # Breaker: a failed trial opens the circuit again
+    for fn in (fail,) * 4:
+        try:
+            breaker.call(fn)
+        except ConnectionError:
+            pass
+    time.sleep(0.15)
+    try:
+        breaker.call(fail)
+    except ConnectionError:
+        pass
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # Breaker: successful but slow calls trip it too
+    breaker = CircuitBreaker("check", slow_call_seconds=0.02, slow_rate=0.5, window=4, min_calls=2)
+    breaker.call(time.sleep, 0.03)
+    breaker.call(time.sleep, 0.03)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # Fault injection: errors and timeouts surface as exceptions the breaker counts
+    stub = StubEmbeddingGenerator(8)
+    assert len(FaultInjectingEmbeddingGenerator(stub).embed_query_chunks("java developer")) == 1
+    failing = FaultInjectingEmbeddingGenerator(stub, error_rate=1.0)
+    slow = FaultInjectingEmbeddingGenerator(stub, latency=0.5)
+    breaker = CircuitBreaker("embeddings", window=4, min_calls=2, open_seconds=60)
+    for generator, error in ((failing, ConnectionError), (slow, TimeoutError)):
+        begin = time.perf_counter()
+        try:
+            breaker.call(generator.embed_query_chunks, "java developer", timeout=0.05)
+            raise AssertionError("no fault was injected")
+        except error:
+            pass
+        assert time.perf_counter() - begin < 0.4, "the injected latency ignored the call timeout"
+    assert breaker.state == CircuitBreaker.OPEN
+    print("Resilience checks passed")
@@ -0,0 +1,284 @@
+import os
+import io
+import time
+import hashlib
+import logging
+import argparse
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from lexical import tokenize
+from reduction import normalize_rows
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Canonical role descriptions (one per line, '#' comments) whose recommendations are precomputed
+ROLE_TEMPLATES_PATH = os.getenv("ROLE_TEMPLATES", "role_templates.txt")
+# Precomputed tables, one <catalog version>.npz file per catalog version
+TEMPLATE_TABLE_PATH = os.getenv("TEMPLATE_TABLES", "template_recommendations")
+TEMPLATE_TABLE_KEEP = int(os.getenv("TEMPLATE_TABLES_KEEP", 3))
+# Results stored per template; the API accepts top_n up to 50
+TEMPLATE_TOP_N = 50
+# Minimum cosine similarity between a query and a template for the template's results to be reused
+TEMPLATE_MATCH_THRESHOLD = float(os.getenv("TEMPLATE_MATCH_THRESHOLD", 0.95))
+# Seconds before a missing table for the active catalog version is looked for again
+TEMPLATE_RECHECK_SECONDS = float(os.getenv("TEMPLATE_RECHECK_SECONDS", 30))
+
+TEMPLATE_FORMAT_VERSION = 1
+
+
+def template_key(text: str) -> str:
+    """Order-, case- and punctuation-insensitive key: "Java Developer" and "developer, java" match."""
+    return " ".join(sorted(set(tokenize(text))))
+
+
+def load_role_templates(path: str = ROLE_TEMPLATES_PATH) -> List[str]:
+    """Read canonical role descriptions, skipping blank lines, comments and duplicates."""
+    templates = []
+    seen = set()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            text = line.strip()
+            key = template_key(text)
+            if not text or text.startswith('#') or not key or key in seen:
+                continue
+            seen.add(key)
+            templates.append(text)
+    return templates
+
+
+def templates_fingerprint(templates: List[str]) -> str:
+    return hashlib.sha1("\n".join(templates).encode('utf-8')).hexdigest()[:12]
+
+
+def template_table_exists(version: str, path: str = TEMPLATE_TABLE_PATH) -> bool:
+    """Cheap check for a stored table of a catalog version, without loading it."""
+    return os.path.exists(os.path.join(path, f"{version}.npz"))
+
+
+class TemplateTable:
+    """
+    Ranked results of the canonical role templates against one catalog version.
+    A query is answered from the table when its template key equals a template's (no embedding
+    call at all), or when its embedding is within TEMPLATE_MATCH_THRESHOLD of a template's.
+    """
+    def __init__(self, version: str, templates: List[str], vectors: np.ndarray, rows: np.ndarray,
+                 scores: np.ndarray, fingerprint: Optional[str] = None):
+        """
+        Args:
+            version (str): Catalog version the results were computed against
+            templates (List[str]): Template texts
+            vectors (np.ndarray): Template embeddings in the catalog's scoring space (templates x index_dim)
+            rows (np.ndarray): Catalog rows of each template's results, best first (templates x TEMPLATE_TOP_N)
+            scores (np.ndarray): Similarity scores of those rows
+            fingerprint (str): Fingerprint of the template list the table was built from
+        """
+        self.version = version
+        self.templates = list(templates)
+        self.vectors = vectors
+        self.rows = rows
+        self.scores = scores
+        self.fingerprint = fingerprint or templates_fingerprint(self.templates)
+        self._keys: Dict[str, int] = {template_key(text): i for i, text in enumerate(self.templates)}
+
+    def __len__(self):
+        return len(self.templates)
+
+    def match_text(self, query: str) -> Optional[int]:
+        """Template whose key equals the query's, if any."""
+        return self._keys.get(template_key(query))
+
+    def match_vector(self, query_vector: np.ndarray, threshold: float = TEMPLATE_MATCH_THRESHOLD) -> Optional[int]:
+        """Nearest template to a normalized query vector, if it is at least `threshold` similar."""
+        similarities = self.vectors @ query_vector
+        best = int(np.argmax(similarities))
+        return best if similarities[best] >= threshold else None
+
+    def results(self, template: int, top_n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Catalog rows and scores of a template's top_n results."""
+        return self.rows[template, :top_n], self.scores[template, :top_n]
+
+    def save(self, path: str = TEMPLATE_TABLE_PATH) -> str:
+        """Write the table to <path>/<version>.npz atomically and return the file path."""
+        os.makedirs(path, exist_ok=True)
+        file_path = os.path.join(path, f"{self.version}.npz")
+        buffer = io.BytesIO()
+        np.savez(buffer, format_version=TEMPLATE_FORMAT_VERSION, version=self.version,
+                 fingerprint=self.fingerprint, templates=np.array(self.templates),
+                 vectors=self.vectors, rows=self.rows, scores=self.scores)
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp_path, file_path)
+        return file_path
+
+    @classmethod
+    def load(cls, version: str, path: str = TEMPLATE_TABLE_PATH) -> Optional['TemplateTable']:
+        """Load the table for a catalog version, or None if there is none (or it is unreadable)."""
+        if not template_table_exists(version, path):
+            return None
+        file_path = os.path.join(path, f"{version}.npz")
+        try:
+            with np.load(file_path) as data:
+                if int(data['format_version']) != TEMPLATE_FORMAT_VERSION or str(data['version']) != version:
+                    logging.warning(f"Ignoring incompatible template table {file_path}")
+                    return None
+                return cls(version, [str(t) for t in data['templates']], data['vectors'],
+                           data['rows'], data['scores'], str(data['fingerprint']))
+        except Exception as e:
+            logging.error(f"Error loading template table {file_path}: {e}")
+            return None
+
+
+class TemplateStore:
+    """
+    Per-process cache of the template table for the active catalog version, shared by the
+    request threads. Tables are written after their catalog version is published (and rewritten
+    when the template list changes), so the file is looked at again every TEMPLATE_RECHECK_SECONDS.
+    """
+    def __init__(self, path: str = TEMPLATE_TABLE_PATH):
+        self.path = path
+        self._version = None
+        self._table = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, version: str) -> Optional[TemplateTable]:
+        with self._lock:
+            now = time.monotonic()
+            if version == self._version and now - self._checked_at < TEMPLATE_RECHECK_SECONDS:
+                return self._table
+
+            file_path = os.path.join(self.path, f"{version}.npz")
+            mtime = os.path.getmtime(file_path) if os.path.exists(file_path) else None
+            if version != self._version or mtime != self._mtime:
+                self._table = TemplateTable.load(version, self.path) if mtime is not None else None
+                if self._table is not None:
+                    logging.info(f"Loaded {len(self._table)} precomputed role templates for catalog version {version}")
+            self._version, self._mtime, self._checked_at = version, mtime, now
+            return self._table
+
+
+def build_template_table(catalog, templates: List[str], embedding_generator,
+                         top_n: int = TEMPLATE_TOP_N) -> TemplateTable:
+    """
+    Batch-embed the templates and rank the catalog for all of them at once.
+
+    Args:
+        catalog (CatalogVersion): Catalog version to score against
+        templates (List[str]): Canonical role descriptions
+        embedding_generator (EmbeddingGenerator): Embeds the templates (MAX_BATCH_SIZE per call)
+        top_n (int): Results stored per template
+
+    Returns:
+        TemplateTable: Ranked results keyed by the catalog's version
+    """
+    from recommender import top_k
+
+    embeddings = embedding_generator.generate_embeddings_batch(templates)
+    embedded = [(text, e) for text, e in zip(templates, embeddings) if e is not None]
+    if len(embedded) < len(templates):
+        logging.warning(f"{len(templates) - len(embedded)} role templates could not be embedded; skipped")
+    if not embedded:
+        raise ValueError("no role template could be embedded")
+
+    vectors = np.asarray([e for _, e in embedded], dtype=np.float32)
+    if catalog.reducer is not None:
+        vectors = catalog.reducer.transform(vectors)
+    vectors = normalize_rows(vectors)
+
+    # One catalog x templates product; multi-vector catalogs take the segment-max per assessment
+    if catalog.segments is None:
+        scores = catalog.index @ vectors.T
+    else:
+        scores = np.maximum.reduceat(catalog.segments @ vectors.T, catalog.offsets, axis=0)
+
+    top_n = min(top_n, len(catalog))
+    rows = np.stack([top_k(scores[:, i], top_n) for i in range(len(embedded))])
+    row_scores = np.take_along_axis(scores.T, rows, axis=1)
+    return TemplateTable(catalog.version, [text for text, _ in embedded], vectors,
+                         rows.astype(np.int32), row_scores.astype(np.float32), templates_fingerprint(templates))
+
+
+def _prune_tables(path: str, current: str):
+    """Keep the newest TEMPLATE_TABLE_KEEP tables, like catalog snapshot versions."""
+    files = [name for name in os.listdir(path) if name.endswith('.npz') and name != f"{current}.npz"]
+    files.sort(key=lambda name: os.path.getmtime(os.path.join(path, name)), reverse=True)
+    for name in files[max(0, TEMPLATE_TABLE_KEEP - 1):]:
+        os.remove(os.path.join(path, name))
+
+
+def _is_up_to_date(version: str, templates: List[str], table_path: str) -> bool:
+    """Whether the stored table of a catalog version was built from this template list."""
+    existing = TemplateTable.load(version, table_path)
+    if existing is not None and existing.fingerprint == templates_fingerprint(templates):
+        logging.info(f"Role template table for catalog version {version} is up to date")
+        return True
+    return False
+
+
+def generate_template_table(database=None, snapshot_path: Optional[str] = None,
+                            templates_path: str = ROLE_TEMPLATES_PATH, table_path: str = TEMPLATE_TABLE_PATH,
+                            embedding_generator=None) -> bool:
+    """
+    Precompute the role template table for the catalog version the servers load, and skip the
+    work (before any embedding client or catalog is loaded) if a table for the current snapshot
+    version and template list already exists.
+
+    Returns:
+        bool: Success status
+    """
+    from recommender import AssessmentRecommender, SNAPSHOT_PATH
+    from database import snapshot_version
+    from embeddings import EmbeddingGenerator
+
+    if not os.path.exists(templates_path):
+        logging.warning(f"No role templates at {templates_path}; skipping precomputed recommendations")
+        return False
+    templates = load_role_templates(templates_path)
+    if not templates:
+        logging.warning(f"{templates_path} lists no role templates")
+        return False
+
+    version = snapshot_version(snapshot_path or SNAPSHOT_PATH)
+    if version is not None and _is_up_to_date(version, templates, table_path):
+        return True
+
+    embedding_generator = embedding_generator or EmbeddingGenerator()
+    if embedding_generator.client is None:
+        logging.error("Embedding client not available; precomputed recommendations not generated")
+        return False
+
+    # Load the catalog exactly like the servers do, so the table is keyed by the same version
+    recommender = AssessmentRecommender(database=database, embedding_generator=embedding_generator,
+                                        snapshot_path=snapshot_path, watch=False, query_cache_size=0,
+                                        breaker=False, templates=False)
+    catalog = recommender.catalog.active
+    if catalog is None:
+        logging.error("No catalog loaded; precomputed recommendations not generated")
+        return False
+
+    if catalog.version != version and _is_up_to_date(catalog.version, templates, table_path):
+        return True
+
+    try:
+        start = time.perf_counter()
+        table = build_template_table(catalog, templates, embedding_generator)
+        file_path = table.save(table_path)
+        _prune_tables(table_path, catalog.version)
+    except Exception as e:
+        logging.error(f"Error generating role template table: {e}")
+        return False
+    logging.info(f"Precomputed recommendations for {len(table)} role templates against catalog version "
+                 f"{catalog.version} in {time.perf_counter() - start:.1f}s ({file_path})")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Precompute recommendations for canonical role templates')
+    parser.add_argument('--templates', default=ROLE_TEMPLATES_PATH, help='Role templates, one per line')
+    parser.add_argument('--output', default=TEMPLATE_TABLE_PATH, help='Directory of per-version tables')
+    args = parser.parse_args()
+    raise SystemExit(0 if generate_template_table(templates_path=args.templates, table_path=args.output) else 1)
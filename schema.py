@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, HttpUrl
-from typing import List, Dict, Optional, Union, Any
+from typing import List, Dict, Optional, Union, Any, Literal
 
 class HealthResponse(BaseModel):
     """Response model for the health endpoint."""
@@ -11,10 +11,19 @@ class RecommendationRequest(BaseModel):
                     title="Input Text",
                     description="Job description or natural language query to get assessment recommendations",
                     min_length=10)
-    top_n: Optional[int] = Field(10, 
-                               title="Number of Recommendations",
-                               description="Number of recommendations to return",
-                               ge=1, le=50)
+    top_n: int = Field(10, 
+                       title="Number of Recommendations",
+                       description="Number of recommendations to return",
+                       ge=1, le=50)
+    diversity_lambda: Optional[float] = Field(None,
+                                              title="Diversity Trade-off",
+                                              description="Re-rank with Maximal Marginal Relevance: 1.0 ranks purely by relevance, "
+                                                          "lower values favour diverse assessments (omit to disable)",
+                                              ge=0.0, le=1.0)
+    pooling: Optional[Literal["max", "mean"]] = Field(None,
+                                                      title="Chunk Pooling",
+                                                      description="How scores of a long, chunked job description are combined: "
+                                                                  "'max' (best matching chunk) or 'mean' (defaults to the server setting)")
 
 class Assessment(BaseModel):
     """Model for an assessment recommendation."""
@@ -31,4 +40,8 @@ class RecommendationResponse(BaseModel):
     """Response model for the recommendation endpoint."""
     query: str
     recommendations: List[Assessment]
-    count: int
\ No newline at end of file
+    count: int
+    mode: Optional[Literal["semantic", "template", "lexical"]] = Field(None,
+                                                                      description="'semantic' normally; 'template' when precomputed results "
+                                                                                  "of a matching role template were used; 'lexical' when the "
+                                                                                  "embedding service was unavailable and keyword (BM25) ranking was used")
\ No newline at end of file
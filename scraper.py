@@ -20,94 +20,119 @@ class SHLCatalogScraper:
         """
         Scrapes the SHL product catalog and returns a DataFrame with assessment metadata.
         """
+        return pd.DataFrame(list(self.iter_catalog()))
+
+    def iter_catalog(self, with_details=False):
+        """
+        Scrapes the SHL product catalog and yields one assessment record at a time.
+        
+        Args:
+            with_details (bool): Fetch each product page and merge its detailed description
+        """
         logging.info("Starting to scrape SHL product catalog...")
         
         try:
             response = requests.get(self.base_url, headers=self.headers)
             response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error fetching SHL catalog: {e}")
+            return
+        
+        soup = BeautifulSoup(response.content, 'html.parser')
+        
+        # Find all product cards/sections
+        product_sections = soup.find_all('div', class_=lambda c: c and 'product-' in c)
+        
+        count = 0
+        for section in product_sections:
+            assessment = self._parse_section(section)
+            if assessment is None:
+                continue
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            if with_details and assessment['url']:
+                detailed_desc = self.get_detailed_description(assessment['url'])
+                if detailed_desc:
+                    # Combine with existing description or replace if empty
+                    if assessment['description']:
+                        assessment['description'] = f"{assessment['description']} {detailed_desc}"
+                    else:
+                        assessment['description'] = detailed_desc
+            
+            count += 1
+            yield assessment
+        
+        logging.info(f"Successfully scraped {count} assessments from SHL catalog")
+
+    def _parse_section(self, section):
+        """
+        Extracts assessment metadata from a single product card, or None if it is not an assessment.
+        """
+        try:
+            # Extract assessment name
+            name_elem = section.find('h3')
+            if not name_elem:
+                return None
+            name = name_elem.text.strip()
             
-            # Find all product cards/sections
-            product_sections = soup.find_all('div', class_=lambda c: c and 'product-' in c)
-            
-            assessments = []
-            
-            for section in product_sections:
-                try:
-                    # Extract assessment name
-                    name_elem = section.find('h3')
-                    if not name_elem:
-                        continue
-                    name = name_elem.text.strip()
-                    
-                    # Extract URL if available
-                    url = ""
-                    url_elem = section.find('a', href=True)
-                    if url_elem:
-                        url = url_elem['href']
-                        if not url.startswith('http'):
-                            url = f"https://www.shl.com{url}"
-                    
-                    # Extract description
-                    description = ""
-                    desc_elem = section.find('p')
-                    if desc_elem:
-                        description = desc_elem.text.strip()
-                    
-                    # Extract metadata like remote testing, IRT support, duration, test type
-                    metadata_text = section.text.strip()
-                    
-                    # Check for remote testing support
-                    remote_testing = "Yes" if "remote" in metadata_text.lower() else "Unknown"
-                    
-                    # Check for IRT (Item Response Theory) support
-                    irt_support = "Yes" if "irt" in metadata_text.lower() or "item response theory" in metadata_text.lower() else "Unknown"
-                    
-                    # Extract duration
-                    duration = "Unknown"
-                    duration_match = re.search(r'(\d+)[-\s]?(?:to)?[-\s]?(\d+)?\s*(?:min|minutes)', metadata_text, re.IGNORECASE)
-                    if duration_match:
-                        if duration_match.group(2):
-                            duration = f"{duration_match.group(1)}-{duration_match.group(2)} minutes"
-                        else:
-                            duration = f"{duration_match.group(1)} minutes"
-                    
-                    # Determine test type
-                    test_type = "Unknown"
-                    
-                    if "personality" in metadata_text.lower():
-                        test_type = "Personality Assessment"
-                    elif "cognitive" in metadata_text.lower() or "ability" in metadata_text.lower():
-                        test_type = "Cognitive Assessment"
-                    elif "skill" in metadata_text.lower():
-                        test_type = "Skill Assessment"
-                    elif "behavioral" in metadata_text.lower():
-                        test_type = "Behavioral Assessment"
-                    elif "situational" in metadata_text.lower() or "judgment" in metadata_text.lower():
-                        test_type = "Situational Judgment Test"
-                    
-                    assessments.append({
-                        'name': name,
-                        'url': url,
-                        'description': description,
-                        'remote_testing': remote_testing,
-                        'irt_support': irt_support,
-                        'duration': duration,
-                        'test_type': test_type
-                    })
-                    
-                except Exception as e:
-                    logging.error(f"Error processing assessment section: {e}")
-                    continue
-            
-            logging.info(f"Successfully scraped {len(assessments)} assessments from SHL catalog")
-            
-            return pd.DataFrame(assessments)
+            # Extract URL if available
+            url = ""
+            url_elem = section.find('a', href=True)
+            if url_elem:
+                url = url_elem['href']
+                if not url.startswith('http'):
+                    url = f"https://www.shl.com{url}"
             
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error fetching SHL catalog: {e}")
-            return pd.DataFrame()
+            # Extract description
+            description = ""
+            desc_elem = section.find('p')
+            if desc_elem:
+                description = desc_elem.text.strip()
+            
+            # Extract metadata like remote testing, IRT support, duration, test type
+            metadata_text = section.text.strip()
+            
+            # Check for remote testing support
+            remote_testing = "Yes" if "remote" in metadata_text.lower() else "Unknown"
+            
+            # Check for IRT (Item Response Theory) support
+            irt_support = "Yes" if "irt" in metadata_text.lower() or "item response theory" in metadata_text.lower() else "Unknown"
+            
+            # Extract duration
+            duration = "Unknown"
+            duration_match = re.search(r'(\d+)[-\s]?(?:to)?[-\s]?(\d+)?\s*(?:min|minutes)', metadata_text, re.IGNORECASE)
+            if duration_match:
+                if duration_match.group(2):
+                    duration = f"{duration_match.group(1)}-{duration_match.group(2)} minutes"
+                else:
+                    duration = f"{duration_match.group(1)} minutes"
+            
+            # Determine test type
+            test_type = "Unknown"
+            
+            if "personality" in metadata_text.lower():
+                test_type = "Personality Assessment"
+            elif "cognitive" in metadata_text.lower() or "ability" in metadata_text.lower():
+                test_type = "Cognitive Assessment"
+            elif "skill" in metadata_text.lower():
+                test_type = "Skill Assessment"
+            elif "behavioral" in metadata_text.lower():
+                test_type = "Behavioral Assessment"
+            elif "situational" in metadata_text.lower() or "judgment" in metadata_text.lower():
+                test_type = "Situational Judgment Test"
+            
+            return {
+                'name': name,
+                'url': url,
+                'description': description,
+                'remote_testing': remote_testing,
+                'irt_support': irt_support,
+                'duration': duration,
+                'test_type': test_type
+            }
+            
+        except Exception as e:
+            logging.error(f"Error processing assessment section: {e}")
+            return None
 
     def get_detailed_description(self, url):
         """
@@ -137,20 +162,10 @@ def scrape_and_save(output_path='assessments.csv'):
     Scrapes the SHL catalog and saves the data to a CSV file.
     """
     scraper = SHLCatalogScraper()
-    df = scraper.scrape_catalog()
+    # For assessments with URLs, try to get more detailed descriptions
+    df = pd.DataFrame(list(scraper.iter_catalog(with_details=True)))
     
     if not df.empty:
-        # For assessments with URLs, try to get more detailed descriptions
-        for idx, row in df.iterrows():
-            if row['url']:
-                detailed_desc = scraper.get_detailed_description(row['url'])
-                if detailed_desc:
-                    # Combine with existing description or replace if empty
-                    if row['description']:
-                        df.at[idx, 'description'] = f"{row['description']} {detailed_desc}"
-                    else:
-                        df.at[idx, 'description'] = detailed_desc
-        
         # Save to CSV
         df.to_csv(output_path, index=False)
         logging.info(f"Saved assessment data to {output_path}")
@@ -1,55 +1,160 @@
+import os
 import streamlit as st
 import pandas as pd
 import requests
-import json
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Define API endpoints
-API_BASE_URL = "http://localhost:8000"
+API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 RECOMMEND_ENDPOINT = f"{API_BASE_URL}/recommend"
 HEALTH_ENDPOINT = f"{API_BASE_URL}/health"
+CATALOG_VERSION_HEADER = "X-Catalog-Version"
 
-def check_api_health() -> bool:
-    """Check if the API is running."""
+# 'http' calls the API; 'inprocess' calls a shared recommender in this process (UI and API on one host)
+UI_BACKEND = os.getenv("UI_BACKEND", "http")
+
+# Seconds to wait for a connection and for a response
+CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", 3.05))
+READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", 30))
+HEALTH_TIMEOUT = 2.0
+
+# Seconds a health check / recommendation result is reused across reruns
+HEALTH_CACHE_TTL = int(os.getenv("UI_HEALTH_CACHE_TTL", 15))
+RESULTS_CACHE_TTL = int(os.getenv("UI_RESULTS_CACHE_TTL", 600))
+RESULTS_CACHE_ENTRIES = 256
+
+class RecommendationError(Exception):
+    """Raised when recommendations could not be fetched; failures are never cached."""
+
+class _Uncached(Exception):
+    """
+    Returns results without caching them: empty results and lexical fallback results
+    (both usually caused by a transient embedding failure).
+    """
+    def __init__(self, recommendations: List[Dict[str, Any]]):
+        super().__init__()
+        self.recommendations = recommendations
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """HTTP session shared by all users and reruns, keeping connections to the API alive."""
+    session = requests.Session()
+    # Retry only failed connections; a request that reached the API is not repeated
+    retries = Retry(total=2, connect=2, read=False, status=0, backoff_factor=0.3, allowed_methods=None)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource
+def get_local_recommender():
+    """The process-wide recommender, loaded once for in-process mode."""
+    from recommender import get_shared_recommender
+    return get_shared_recommender()
+
+@st.cache_resource
+def get_executor() -> ThreadPoolExecutor:
+    """Worker threads that let in-process calls be abandoned after READ_TIMEOUT."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="recommend")
+
+@st.cache_data(ttl=HEALTH_CACHE_TTL, show_spinner=False)
+def _healthy(backend: str) -> Optional[str]:
+    """
+    Raise unless the backend is ready; only successful checks are cached.
+    Returns the active catalog version (None if the API has not loaded its catalog yet).
+    """
+    if backend == "inprocess":
+        version = get_local_recommender().catalog_version
+        if version is None:
+            raise RuntimeError("no catalog loaded")
+        return version
+    response = get_session().get(HEALTH_ENDPOINT, timeout=(CONNECT_TIMEOUT, HEALTH_TIMEOUT))
+    if response.status_code != 200 or response.json().get("status") != "ok":
+        raise RuntimeError(f"health endpoint returned {response.status_code}")
+    return response.headers.get(CATALOG_VERSION_HEADER)
+
+def check_api_health(backend: str = UI_BACKEND) -> bool:
+    """Check if the API (or the in-process recommender) is ready."""
     try:
-        response = requests.get(HEALTH_ENDPOINT)
-        return response.status_code == 200 and response.json().get("status") == "ok"
+        _healthy(backend)
+        return True
     except Exception as e:
         logging.error(f"API health check failed: {e}")
         return False
 
-def get_recommendations(text: str, top_n: int = 10) -> List[Dict[str, Any]]:
+def current_catalog_version(backend: str = UI_BACKEND) -> Optional[str]:
+    """Catalog version served by the backend, as of its last health check (None if unknown)."""
+    try:
+        return _healthy(backend)
+    except Exception:
+        return None
+
+def get_recommendations(text: str, top_n: int = 10, backend: str = UI_BACKEND) -> List[Dict[str, Any]]:
     """
-    Get assessment recommendations from the API.
+    Get assessment recommendations from the API, or from the in-process recommender.
+    Results are memoized per (text, top_n, backend, catalog version) for RESULTS_CACHE_TTL seconds,
+    so a newly published catalog is served within HEALTH_CACHE_TTL seconds of its activation.
     
     Args:
         text (str): Job description or query
         top_n (int): Number of recommendations to return
+        backend (str): 'http' or 'inprocess'
         
     Returns:
         List[Dict]: List of assessment recommendations
+        
+    Raises:
+        RecommendationError: If the request failed or timed out
     """
     try:
-        payload = {
-            "text": text,
-            "top_n": top_n
-        }
-        
-        response = requests.post(RECOMMEND_ENDPOINT, json=payload)
-        
-        if response.status_code == 200:
-            data = response.json()
-            return data.get("recommendations", [])
-        else:
-            logging.error(f"API request failed with status code {response.status_code}: {response.text}")
-            return []
-    except Exception as e:
+        return _fetch_recommendations(text, top_n, backend, current_catalog_version(backend))
+    except _Uncached as e:
+        return e.recommendations
+
+@st.cache_data(ttl=RESULTS_CACHE_TTL, max_entries=RESULTS_CACHE_ENTRIES, show_spinner=False)
+def _fetch_recommendations(text: str, top_n: int, backend: str, catalog_version: Optional[str]) -> List[Dict[str, Any]]:
+    # catalog_version is only part of the cache key
+    if backend == "inprocess":
+        future = get_executor().submit(get_local_recommender().recommend_with_mode, text, top_n)
+        try:
+            recommendations, _, mode = future.result(timeout=READ_TIMEOUT)
+        except FutureTimeout:
+            raise RecommendationError(f"Recommender did not answer within {READ_TIMEOUT:.0f}s")
+        except Exception as e:
+            logging.error(f"Error getting recommendations: {e}")
+            raise RecommendationError("Failed to get recommendations")
+    else:
+        recommendations, mode = _post_recommend(text, top_n)
+
+    if not recommendations or mode == "lexical":
+        raise _Uncached(recommendations)
+    return recommendations
+
+def _post_recommend(text: str, top_n: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    payload = {
+        "text": text,
+        "top_n": top_n
+    }
+    try:
+        response = get_session().post(RECOMMEND_ENDPOINT, json=payload, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    except requests.exceptions.Timeout:
+        raise RecommendationError(f"API did not answer within {READ_TIMEOUT:.0f}s")
+    except requests.exceptions.RequestException as e:
         logging.error(f"Error getting recommendations: {e}")
-        return []
+        raise RecommendationError("Could not reach the API")
+    
+    if response.status_code != 200:
+        logging.error(f"API request failed with status code {response.status_code}: {response.text}")
+        raise RecommendationError(f"API request failed with status code {response.status_code}")
+    result = response.json()
+    return result.get("recommendations", []), result.get("mode")
 
 def main():
     st.set_page_config(
@@ -89,7 +194,10 @@ def main():
     api_healthy = check_api_health()
     
     if not api_healthy:
-        st.error("⚠️ API service is not available. Please make sure the backend server is running.")
+        if UI_BACKEND == "inprocess":
+            st.error("⚠️ No assessment data is loaded. Please run the data initialization first.")
+        else:
+            st.error("⚠️ API service is not available. Please make sure the backend server is running.")
         st.stop()
     
     # Input form
@@ -118,8 +226,12 @@ def main():
         if len(text_input.strip()) < 10:
             st.warning("Please enter a more detailed description (at least 10 characters).")
         else:
-            with st.spinner("Generating recommendations..."):
-                recommendations = get_recommendations(text_input, top_n)
+            try:
+                with st.spinner("Generating recommendations..."):
+                    recommendations = get_recommendations(text_input, int(top_n))
+            except RecommendationError as e:
+                st.error(f"⚠️ {e}. Please try again.")
+                st.stop()
             
             if recommendations:
                 st.success(f"Found {len(recommendations)} relevant assessments")